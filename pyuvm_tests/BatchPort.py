@@ -0,0 +1,74 @@
+from cocotb.utils import get_sim_time
+from pyuvm import uvm_analysis_port, uvm_subscriber, uvm_tlm_analysis_fifo
+
+
+# Analysis port delivering lists of items
+class BatchAnalysisPort(uvm_analysis_port):
+    """Analysis port which collects written items & delivers them in batches
+
+    A batch is delivered when size items are collected, when time_ns of
+    sim time passed since its first item (checked on write) or on flush().
+    Subscribers with write_batch() get the batch as list, the others item
+    by item. Flush the port at the end of the run phase, e.g. in the
+    extract_phase of its component.
+    """
+
+    def __init__(self, name, parent, size=64, time_ns=None):
+        super().__init__(name, parent)
+        self.size = size
+        self.time_ns = time_ns
+        self._batch = []
+        self._first = None
+
+    def write(self, datum):
+        self._batch.append(datum)
+        if len(self._batch) >= self.size:
+            self.flush()
+        elif self.time_ns is not None:
+            _now = get_sim_time("ns")
+            if self._first is None:
+                self._first = _now
+            elif _now - self._first >= self.time_ns:
+                self.flush()
+
+    def flush(self):
+        """Deliver the collected items to all subscribers"""
+        if not self._batch:
+            return
+        _batch, self._batch, self._first = self._batch, [], None
+        for export in self.subscribers:
+            if hasattr(export, "write_batch"):
+                export.write_batch(_batch)
+            else:
+                for datum in _batch:
+                    export.write(datum)
+
+
+# Subscriber accepting batches
+class BatchSubscriber(uvm_subscriber):
+    """Subscriber whose analysis_export takes batches
+
+    write_batch() calls write() per item by default, override it to
+    process a batch at once.
+    """
+
+    # Created by uvm_subscriber.__init__() as analysis_export
+    class uvm_AnalysisImp(uvm_subscriber.uvm_AnalysisImp):
+        def write_batch(self, items):
+            self.get_parent().write_batch(items)
+
+    def write_batch(self, items):
+        for tt in items:
+            self.write(tt)
+
+
+# Analysis FIFO accepting batches
+class BatchAnalysisFifo(uvm_tlm_analysis_fifo):
+    """Analysis FIFO whose analysis_export takes batches"""
+
+    # Created by uvm_tlm_analysis_fifo.__init__() as analysis_export
+    class uvm_AnalysisExport(uvm_tlm_analysis_fifo.uvm_AnalysisExport):
+        def write_batch(self, items):
+            # Unbounded queue, put_nowait() can't fail
+            for item in items:
+                self.queue.put_nowait(item)
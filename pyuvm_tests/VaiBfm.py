@@ -1,11 +1,19 @@
-import cocotb
-from cocotb.triggers import RisingEdge, Timer
-from cocotb.queue import QueueEmpty, Queue
-from cocotb.clock import Clock
-import logging
 import enum
+import logging
+from typing import ClassVar
+
+import cocotb
 import pyuvm
+import Tlm
+from cocotb.queue import Queue, QueueEmpty
+from cocotb.result import SimTimeoutError
+from cocotb.triggers import RisingEdge, Timer, with_timeout
+from HdlClock import start_clock
+from Profiler import profiled
+from Vai import VaiBus
+from Watchdog import TIMEOUT, BfmTimeoutError, progress
 
+from VaiTlm import VaiTlm
 
 # Logger setup
 logging.basicConfig(level=logging.NOTSET)
@@ -21,83 +29,161 @@ class Mode(enum.IntEnum):
 
 
 # VAI BFM with queues for
-class VaiBfm(metaclass=pyuvm.Singleton):
-    """Valid-Accept Bfm"""
-
-    def __init__(self):
+class VaiBfm:
+    """Valid-Accept Bfm
+
+    Ports of the interface are found in entity by their name with prefix,
+    clock & reset also without it, when they are shared by interfaces.
+    All ports are resolved & checked once at construction, the coroutines
+    only access the cached handles.
+    Monitors sample the fields in the form the scoreboard consumes them.
+    get_output() waits at most timeout clock cycles for a result.
+    """
+
+    # Control ports & their widths
+    ports: ClassVar[dict] = {
+        "clk_i": 1,
+        "reset_i": 1,
+        "valid_i": 1,
+        "accept_o": 1,
+        "valid_o": 1,
+        "accept_i": 1,
+    }
+    shared_ports = ("clk_i", "reset_i")
+    input_fields = (
+        ("mode_i", 1, "int"),
+        ("key_i", 128, "bytes"),
+        ("data_i", 128, "bytes"),
+    )
+    output_fields = (("data_o", 128, "bytes"),)
+
+    def __init__(self, entity, prefix="", period_ns=10, timeout=None):
         self.log = logging.getLogger()
-        self.log.info("Valid-accept BFM")
+        self.log.info("Valid-accept BFM %s", f"{entity._path}.{prefix}*")
         self.log.info("  Copyright (c) 2024 Torsten Meissner")
-        self.dut = cocotb.top
+        self.dut = entity
+        self.prefix = prefix
+        for name, handle in self._resolve().items():
+            setattr(self, name, handle)
+        self.input_bus = VaiBus(self.dut, self.input_fields, prefix)
+        self.output_bus = VaiBus(self.dut, self.output_fields, prefix)
         self.driver_queue = Queue(maxsize=1)
         self.in_monitor_queue = Queue(maxsize=0)
         self.out_monitor_queue = Queue(maxsize=0)
-        self.clock = Clock(
-            self.dut.clk_i, 10, units="ns"
-        )  # Create a 10 ns period clock
-        cocotb.start_soon(self.clock.start())
+        self.clock = None
+        self.period_ns = period_ns
+        self.timeout = TIMEOUT if timeout is None else timeout
+
+    def _port(self, name):
+        """Handle of port name, None if not found"""
+        for _name in (
+            f"{self.prefix}{name}",
+            name if name in self.shared_ports else None,
+        ):
+            if _name and hasattr(self.dut, _name):
+                return getattr(self.dut, _name)
+        return None
+
+    def _resolve(self):
+        """Resolve the declared ports, return the control port handles
+
+        All missing ports & width mismatches are reported at once.
+        """
+        _handles = {}
+        _errors = []
+        _fields = [f[:2] for f in self.input_fields + self.output_fields]
+        for name, width in list(self.ports.items()) + _fields:
+            handle = self._port(name)
+            if handle is None:
+                _errors.append(f"{self.prefix}{name} not found")
+            elif len(handle) != width:
+                _errors.append(
+                    f"{handle._name} is {len(handle)} bits wide, declared {width}"
+                )
+            elif name in self.ports:
+                _handles[name] = handle
+        if _errors:
+            raise AttributeError(
+                f"VaiBfm ports of {self.dut._path}: {', '.join(_errors)}"
+            )
+        return _handles
+
+    def start_clock(self, period_ns=None):
+        self.clock = start_clock(self.clk_i, period_ns or self.period_ns)
+
+    def state(self):
+        return (
+            f"valid_i={self.valid_i.value} accept_o={self.accept_o.value} "
+            f"valid_o={self.valid_o.value} accept_i={self.accept_i.value}, queued: "
+            f"{self.driver_queue.qsize()} driver, {self.in_monitor_queue.qsize()} input, "
+            f"{self.out_monitor_queue.qsize()} output"
+        )
 
     # Reset coroutine
     async def reset(self):
-        self.dut.reset_i.value = 0
-        self.dut.valid_i.value = 0
-        self.dut.mode_i.value = 0
-        self.dut.key_i.value = 0
-        self.dut.data_i.value = 0
-        self.dut.accept_i.value = 0
+        self.reset_i.value = 0
+        self.valid_i.value = 0
+        self.input_bus.write((0, 0, 0))
+        self.accept_i.value = 0
         await Timer(100, units="ns")
-        self.dut.reset_i.value = 1
+        self.reset_i.value = 1
 
     # VAI input driver
+    @profiled
     async def __driver(self):
-        self.dut.valid_i.value = 0
-        self.dut.key_i.value = 0
-        self.dut.data_i.value = 0
+        # Cached handles & methods, looked up once instead of per cycle
+        clkedge = RisingEdge(self.clk_i)
+        valid_i, accept_o = self.valid_i, self.accept_o
+        write, get_nowait = self.input_bus.write, self.driver_queue.get_nowait
+        valid_i.value = 0
+        write((0, 0, 0))
         while True:
-            await RisingEdge(self.dut.clk_i)
-            if not self.dut.valid_i.value:
+            await clkedge
+            if not valid_i.value:
                 try:
-                    (mode, key, data) = self.driver_queue.get_nowait()
-                    self.dut.mode_i.value = mode
-                    self.dut.key_i.value = key
-                    self.dut.data_i.value = data
-                    self.dut.valid_i.value = 1
+                    write(get_nowait())
+                    valid_i.value = 1
                 except QueueEmpty:
                     continue
             else:
-                if self.dut.accept_o.value:
-                    self.dut.valid_i.value = 0
+                if accept_o.value:
+                    valid_i.value = 0
 
     # VAI output receiver
     # We ignore data out, we use the output monitor instead
+    @profiled
     async def __receiver(self):
-        self.dut.accept_i.value = 0
+        clkedge = RisingEdge(self.clk_i)
+        valid_o, accept_i = self.valid_o, self.accept_i
+        accept_i.value = 0
         while True:
-            await RisingEdge(self.dut.clk_i)
-            if self.dut.valid_o.value and not self.dut.accept_i.value:
-                self.dut.accept_i.value = 1
+            await clkedge
+            if valid_o.value and not accept_i.value:
+                accept_i.value = 1
             else:
-                self.dut.accept_i.value = 0
+                accept_i.value = 0
 
     # VAI input monitor
+    @profiled
     async def __in_monitor(self):
+        clkedge = RisingEdge(self.clk_i)
+        valid_i, accept_o = self.valid_i, self.accept_o
+        read, put_nowait = self.input_bus.read, self.in_monitor_queue.put_nowait
         while True:
-            await RisingEdge(self.dut.clk_i)
-            if self.dut.valid_i.value and self.dut.accept_o.value:
-                in_tuple = (
-                    self.dut.mode_i.value,
-                    self.dut.key_i.value,
-                    self.dut.data_i.value,
-                )
-                self.in_monitor_queue.put_nowait(in_tuple)
+            await clkedge
+            if valid_i.value and accept_o.value:
+                put_nowait(read())
 
     # VAI output monitor
+    @profiled
     async def __out_monitor(self):
+        clkedge = RisingEdge(self.clk_i)
+        valid_o, accept_i = self.valid_o, self.accept_i
+        read, put_nowait = self.output_bus.read, self.out_monitor_queue.put_nowait
         while True:
-            await RisingEdge(self.dut.clk_i)
-            if self.dut.valid_o.value and self.dut.accept_i.value:
-                out_data = self.dut.data_o.value
-                self.out_monitor_queue.put_nowait(out_data)
+            await clkedge
+            if valid_o.value and accept_i.value:
+                put_nowait(read()[0])
 
     # Launching the coroutines using start_soon
     def start_tasks(self):
@@ -112,10 +198,53 @@ class VaiBfm(metaclass=pyuvm.Singleton):
         return data
 
     # The get_output() coroutine returns the next VAI output
+    @profiled(transaction=True)
     async def get_output(self):
-        data = await self.out_monitor_queue.get()
+        if self.timeout and self.out_monitor_queue.empty():
+            try:
+                data = await with_timeout(
+                    self.out_monitor_queue.get(), self.timeout * self.period_ns, "ns"
+                )
+            except SimTimeoutError:
+                raise BfmTimeoutError(
+                    f"No output within {self.timeout} cycles, {self.state()}"
+                ) from None
+        else:
+            data = await self.out_monitor_queue.get()
+        progress()
         return data
 
     # send_op puts the VAI input operation into the driver queue
     async def send_op(self, mode, key, data):
         await self.driver_queue.put((mode, key, data))
+
+
+class VaiBfmFactory(metaclass=pyuvm.Singleton):
+    """Creates one VaiBfm per interface, keyed by entity path & port prefix
+
+    path is the hierarchical path of the entity below the top level. As
+    pyuvm singleton the factory & its BFMs are created anew for each test.
+    With TLM=1 it creates transaction level BFMs instead.
+    """
+
+    def __init__(self):
+        self._bfms = {}
+        self._clocks = set()
+
+    def get(self, path="", prefix="", period_ns=10):
+        key = (path, prefix)
+        if key not in self._bfms and Tlm.ENABLED:
+            self._bfms[key] = VaiTlm(
+                f"{path}.{prefix}aes".lstrip("."), period_ns=period_ns
+            )
+        elif key not in self._bfms:
+            entity = cocotb.top
+            for name in filter(None, path.split(".")):
+                entity = getattr(entity, name)
+            bfm = VaiBfm(entity, prefix, period_ns)
+            # Interfaces can share a clock, start it only once
+            if bfm.clk_i._path not in self._clocks:
+                self._clocks.add(bfm.clk_i._path)
+                bfm.start_clock()
+            self._bfms[key] = bfm
+        return self._bfms[key]
@@ -0,0 +1,70 @@
+import logging
+
+import cocotb
+from cocotb.queue import Queue
+from cocotb.triggers import Timer
+from Profiler import profiled
+from Tlm import AesTlm
+
+
+# Transaction level VaiBfm
+class VaiTlm:
+    """Valid-Accept Bfm on transaction level
+
+    Same interface as VaiBfm on top of the AES model, without signal
+    access. Inputs & outputs are queued in the form VaiBfm samples them.
+    """
+
+    def __init__(self, name="aes", latency=12, period_ns=10):
+        self.log = logging.getLogger()
+        self.log.info("Valid-accept TLM %s", name)
+        self.log.info("  Copyright (c) 2024 Torsten Meissner")
+        self.model = AesTlm(latency, period_ns, name)
+        self.driver_queue = Queue(maxsize=1)
+        self.in_monitor_queue = Queue(maxsize=0)
+        self.out_monitor_queue = Queue(maxsize=0)
+
+    def state(self):
+        return (
+            f"{self.model.state()}, queued: {self.driver_queue.qsize()} driver, "
+            f"{self.in_monitor_queue.qsize()} input, {self.out_monitor_queue.qsize()} output"
+        )
+
+    # Reset coroutine
+    async def reset(self):
+        await Timer(100, units="ns")
+
+    # VAI input driver & monitor
+    @profiled
+    async def __driver(self):
+        while True:
+            mode, key, data = await self.driver_queue.get()
+            _op = (mode, key.to_bytes(16, "big"), data.to_bytes(16, "big"))
+            await self.model.send(_op)
+            self.in_monitor_queue.put_nowait(_op)
+
+    # VAI output receiver & monitor
+    @profiled
+    async def __receiver(self):
+        while True:
+            self.out_monitor_queue.put_nowait(await self.model.receive())
+
+    # Launching the coroutines using start_soon
+    def start_tasks(self):
+        cocotb.start_soon(self.__driver())
+        cocotb.start_soon(self.__receiver())
+
+    # The get_input() coroutine returns the next VAI input
+    async def get_input(self):
+        data = await self.in_monitor_queue.get()
+        return data
+
+    # The get_output() coroutine returns the next VAI output
+    @profiled(transaction=True)
+    async def get_output(self):
+        data = await self.out_monitor_queue.get()
+        return data
+
+    # send_op puts the VAI input operation into the driver queue
+    async def send_op(self, mode, key, data):
+        await self.driver_queue.put((mode, key, data))
@@ -1,42 +1,144 @@
+# Imported first, it measures the startup time until here
+from Startup import lazy_import, startup
+
+# isort: split
+import os
+from typing import ClassVar
+
+import cocotb
+import pyuvm
+from Benchmark import Benchmark, transactions
 from cocotb.triggers import Combine
+from HdlClock import PERIOD_NS
+from Profiler import profiler
 from pyuvm import (
-    uvm_test,
-    uvm_sequence,
-    uvm_sequence_item,
-    uvm_sequencer,
-    uvm_driver,
+    ConfigDB,
+    UVMConfigItemNotFound,
+    uvm_analysis_port,
     uvm_component,
-    uvm_subscriber,
+    uvm_driver,
     uvm_env,
     uvm_factory,
-    uvm_analysis_port,
-    uvm_tlm_analysis_fifo,
     uvm_get_port,
-    ConfigDB,
-    UVMConfigItemNotFound,
+    uvm_sequence,
+    uvm_sequence_item,
+    uvm_sequencer,
+    uvm_test,
 )
-from vsc import get_coverage_report
-from VaiBfm import VaiBfm, Mode
-from Coverage import constraints, covergroup
-from Crypto.Cipher import AES
-import cocotb
-import pyuvm
-import vsc
+from Seeds import run_seeds
+from Watchdog import Watchdog
+
+from BatchPort import BatchAnalysisFifo, BatchAnalysisPort, BatchSubscriber
+from VaiBfm import Mode, VaiBfmFactory
+
+# Heavy dependencies are loaded on first use
+AES = lazy_import("Crypto.Cipher.AES")
+AesCoverage = lazy_import("AesCoverage")
+vsc = lazy_import("vsc")
+
+# Functional coverage, disable with COVERAGE=0
+COVERAGE = os.environ.get("COVERAGE") != "0"
+# Suffix of the coverage database, unique per run for merging
+RUN_ID = f"_{os.environ['RUN_ID']}" if os.environ.get("RUN_ID") else ""
+
+startup.mark("tb_aes imported")
+
+
+def get_config(component, field_name, default):
+    try:
+        return ConfigDB().get(component, "", field_name)
+    except UVMConfigItemNotFound:
+        return default
+
+
+def analysis_port(name, component):
+    """Analysis port, batched if BATCH_SIZE is configured"""
+    size = get_config(component, "BATCH_SIZE", 0)
+    if not size:
+        return uvm_analysis_port(name, component)
+    return BatchAnalysisPort(
+        name, component, size, get_config(component, "BATCH_NS", None)
+    )
+
+
+def flush(ap):
+    """Deliver the items a batched analysis port still collects"""
+    if isinstance(ap, BatchAnalysisPort):
+        ap.flush()
 
 
 @pyuvm.test()
 class AesTest(uvm_test):
-    def build_phase(self):
-        self.env = AesEnv("env", self)
+    # (path, prefix) of the AES interfaces, one environment per interface
+    interfaces = (("", ""),)
 
-    def end_of_elaboration_phase(self):
-        self.test_all = TestAllSeq.create("test_all")
+    def build_phase(self):
+        AesSeqItem.clear_pool()
+        # Reuse sequence items instead of allocating one per operation
+        ConfigDB().set(None, "*", "ITEM_POOL", os.environ.get("ITEM_POOL") == "1")
+        # Deliver analysis items in batches of BATCH items, at latest after BATCH_NS
+        ConfigDB().set(None, "*", "BATCH_SIZE", int(os.environ.get("BATCH", "0")))
+        ConfigDB().set(
+            None, "*", "BATCH_NS", int(os.environ.get("BATCH_NS", "0")) or None
+        )
+        self.envs = []
+        for i, (path, prefix) in enumerate(self.interfaces):
+            name = "env" if len(self.interfaces) == 1 else f"env{i}"
+            ConfigDB().set(self, name, "VAI_PATH", path)
+            ConfigDB().set(self, name, "VAI_PREFIX", prefix)
+            self.envs.append(AesEnv(name, self))
+
+    async def reset(self):
+        """Reset DUTs & coverage between the seed iterations
+
+        The scoreboards are drained by check() at the end of each iteration.
+        """
+        await Combine(*[cocotb.start_soon(env.bfm.reset()) for env in self.envs])
+        for env in self.envs:
+            if COVERAGE:
+                env.coverage.reset()
+
+    async def iteration(self, seed):
+        # New virtual sequences, their constraints are seeded from random
+        test_all = [
+            TestAllSeq.create(f"test_all_{env.get_name()}") for env in self.envs
+        ]
+        # All interfaces are driven concurrently
+        await Combine(
+            *[
+                cocotb.start_soon(seq.start(env.seqr))
+                for seq, env in zip(test_all, self.envs)
+            ]
+        )
+        for env in self.envs:
+            env.flush()
+        # Check & drain all scoreboards, also after a failing one
+        passed = [env.scoreboard.check() for env in self.envs]
+        assert all(passed), f"Scoreboard errors with seed {seed}"
+        # Encryption & decryption sequence per interface
+        return 2 * transactions(20) * len(self.envs)
 
     async def run_phase(self):
         self.raise_objection()
-        await self.test_all.start()
+        # End the test if the BFMs complete no operations anymore
+        watchdog = Watchdog(**{env.get_name(): env.bfm for env in self.envs}).start()
+        # One iteration per seed, SEEDS=K runs K in this simulation
+        with Benchmark(f"pyuvm_{self.get_type_name()}") as bench:
+            bench.stop(
+                await run_seeds(
+                    f"pyuvm_{self.get_type_name()}", self.iteration, self.reset
+                )
+            )
+        watchdog.stop()
         self.drop_objection()
 
+    def report_phase(self):
+        profiler.write_report(self.get_type_name())
+        startup.write_report(self.get_type_name())
+
+    def final_phase(self):
+        AesSeqItem.clear_pool()
+
 
 @pyuvm.test()
 class ParallelTest(AesTest):
@@ -48,8 +150,8 @@ class ParallelTest(AesTest):
 # Virtual sequence that starts other sequences
 class TestAllSeq(uvm_sequence):
     async def body(self):
-        # get the sequencer handle
-        seqr = ConfigDB().get(None, "", "SEQR")
+        # Sequencer of the environment the virtual sequence is started on
+        seqr = self.sequencer
         enc_rand_seq = EncRandSeq("enc_random")
         dec_rand_seq = DecRandSeq("dec_random")
         await enc_rand_seq.start(seqr)
@@ -59,7 +161,7 @@ class TestAllSeq(uvm_sequence):
 # Running encryption and decryption sequences in parallel
 class TestAllParallelSeq(uvm_sequence):
     async def body(self):
-        seqr = ConfigDB().get(None, "", "SEQR")
+        seqr = self.sequencer
         enc_rand_seq = EncRandSeq("enc_random")
         dec_rand_seq = DecRandSeq("dec_random")
         enc_rand_task = cocotb.start_soon(enc_rand_seq.start(seqr))
@@ -68,13 +170,37 @@ class TestAllParallelSeq(uvm_sequence):
 
 
 # Sequence item which holds the stimuli for one operation
+# Items can be reused through a pool, see acquire() & release()
 class AesSeqItem(uvm_sequence_item):
+    _pool: ClassVar[list] = []
+
     def __init__(self, name, mode, key, data):
         super().__init__(name)
         self.mode = mode
         self.key = key
         self.data = data
 
+    @classmethod
+    def acquire(cls, name, mode=0, key=0, data=0):
+        """Get a free item from the pool or create a new one"""
+        if not cls._pool:
+            return cls(name, mode, key, data)
+        item = cls._pool.pop()
+        item.set_name(name)
+        item.mode = mode
+        item.key = key
+        item.data = data
+        return item
+
+    def release(self):
+        """Return item to the pool, only after the driver is done with it"""
+        self._pool.append(self)
+
+    @classmethod
+    def clear_pool(cls):
+        """Drop the pooled items, so they don't outlive a test"""
+        cls._pool.clear()
+
     def __eq__(self, other):
         same = (
             self.mode == other.mode
@@ -84,20 +210,31 @@ class AesSeqItem(uvm_sequence_item):
         return same
 
     def __str__(self):
-        return f"{self.get_name()} : Mode: 0b{self.mode:01x} \
-        Key: 0x{self.key:016x} Data: 0x{self.data:016x}"
+        return (
+            f"{self.get_name()} : Mode: 0b{self.mode:01x} "
+            f"Key: 0x{self.key:032x} Data: 0x{self.data:032x}"
+        )
 
 
 # Abstract basis sequence class
 # set_operands() has to be implemented by class that inherits from this class
 class BaseSeq(uvm_sequence):
     async def body(self):
-        self.cr = constraints()
-        for _ in range(20):
-            aes_tr = AesSeqItem("aes_tr", 0, 0, 0)
+        self.cr = AesCoverage.constraints()
+        try:
+            pool = ConfigDB().get(None, "", "ITEM_POOL")
+        except UVMConfigItemNotFound:
+            pool = False
+        for _ in range(transactions(20)):
+            aes_tr = (
+                AesSeqItem.acquire("aes_tr") if pool else AesSeqItem("aes_tr", 0, 0, 0)
+            )
             await self.start_item(aes_tr)
             self.set_operands(aes_tr)
             await self.finish_item(aes_tr)
+            # Driver called item_done(), item isn't referenced anymore
+            if pool:
+                aes_tr.release()
 
     def set_operands(self, tr):
         pass
@@ -123,10 +260,8 @@ class DecRandSeq(BaseSeq):
 
 class Driver(uvm_driver):
     def build_phase(self):
-        self.ap = uvm_analysis_port("ap", self)
-
-    def start_of_simulation_phase(self):
-        self.bfm = VaiBfm()
+        self.ap = analysis_port("ap", self)
+        self.bfm = ConfigDB().get(self, "", "BFM")
 
     async def launch_tb(self):
         await self.bfm.reset()
@@ -141,11 +276,14 @@ class Driver(uvm_driver):
             self.ap.write(result)
             self.seq_item_port.item_done()
 
+    def extract_phase(self):
+        flush(self.ap)
+
 
 class Scoreboard(uvm_component):
     def build_phase(self):
-        self.input_fifo = uvm_tlm_analysis_fifo("input_fifo", self)
-        self.output_fifo = uvm_tlm_analysis_fifo("output_fifo", self)
+        self.input_fifo = BatchAnalysisFifo("input_fifo", self)
+        self.output_fifo = BatchAnalysisFifo("output_fifo", self)
         self.input_get_port = uvm_get_port("input_get_port", self)
         self.output_get_port = uvm_get_port("output_get_port", self)
         self.input_export = self.input_fifo.analysis_export
@@ -156,31 +294,45 @@ class Scoreboard(uvm_component):
         self.input_get_port.connect(self.input_fifo.get_export)
         self.output_get_port.connect(self.output_fifo.get_export)
 
-    def check_phase(self):
+    def check(self):
+        """Check the results received so far, return True if all passed"""
+        passed = True
         while self.output_get_port.can_get():
             _, result = self.output_get_port.try_get()
             op_success, op = self.input_get_port.try_get()
             if not op_success:
-                self.logger.critical(f"result {result} had no input operation")
+                self.logger.critical("result %s had no input operation", result)
             else:
                 (mode, key, data) = op
-                aes = AES.new(key.buff, AES.MODE_ECB)
+                # Monitors deliver key, data & result as bytes
+                aes = AES.new(key, AES.MODE_ECB)
                 if not mode:
-                    reference = aes.encrypt(data.buff)
+                    reference = aes.encrypt(data)
                 else:
-                    reference = aes.decrypt(data.buff)
-                if result.buff == reference:
+                    reference = aes.decrypt(data)
+                if result == reference:
                     self.logger.info(
-                        f"PASSED: {Mode(mode).name} 0x{data.integer:032x} with key "
-                        f"0x{key.integer:032x} = 0x{result.integer:032x}"
+                        "PASSED: %s 0x%s with key 0x%s = 0x%s",
+                        Mode(mode).name,
+                        data.hex(),
+                        key.hex(),
+                        result.hex(),
                     )
                 else:
                     self.logger.error(
-                        f"FAILED: {Mode(mode).name} 0x{data.integer:032x} with key "
-                        f"0x{key.integer:032x} = 0x{result.integer:032x}, "
-                        f"expected 0x{int.from_bytes(reference, 'big'):032x}"
+                        "FAILED: %s 0x%s with key 0x%s = 0x%s, expected 0x%s",
+                        Mode(mode).name,
+                        data.hex(),
+                        key.hex(),
+                        result.hex(),
+                        reference.hex(),
                     )
-                    self.passed = False
+                    passed = False
+        self.passed &= passed
+        return passed
+
+    def check_phase(self):
+        self.check()
 
     def report_phase(self):
         assert self.passed, "Test failed"
@@ -189,31 +341,44 @@ class Scoreboard(uvm_component):
 class Monitor(uvm_component):
     def __init__(self, name, parent, method_name):
         super().__init__(name, parent)
-        self.bfm = VaiBfm()
-        self.get_method = getattr(self.bfm, method_name)
+        self.method_name = method_name
 
     def build_phase(self):
-        self.ap = uvm_analysis_port("ap", self)
+        self.ap = analysis_port("ap", self)
+        self.bfm = ConfigDB().get(self, "", "BFM")
+        self.get_method = getattr(self.bfm, self.method_name)
 
     async def run_phase(self):
         while True:
             datum = await self.get_method()
-            self.logger.debug(f"MONITORED {datum}")
+            self.logger.debug("MONITORED %s", datum)
             self.ap.write(datum)
 
+    def extract_phase(self):
+        flush(self.ap)
+
 
 # Coverage collector and checker
-class Coverage(uvm_subscriber):
+class Coverage(BatchSubscriber):
     def start_of_simulation_phase(self):
-        self.cg = covergroup()
+        self.reset()
         try:
             self.disable_errors = ConfigDB().get(self, "", "DISABLE_COVERAGE_ERRORS")
         except UVMConfigItemNotFound:
             self.disable_errors = False
 
+    def reset(self):
+        # Fresh instance, the type coverage is merged over the seeds
+        self.cg = AesCoverage.covergroup()
+
     def write(self, data):
         (mode, key, _) = data
-        self.cg.sample(mode, key)
+        self.cg.sample(mode, int.from_bytes(key, "big"))
+
+    def write_batch(self, items):
+        sample = self.cg.sample
+        for mode, key, _ in items:
+            sample(mode, int.from_bytes(key, "big"))
 
     def report_phase(self):
         if not self.disable_errors:
@@ -222,23 +387,35 @@ class Coverage(uvm_subscriber):
             else:
                 self.logger.info("Covered all operations")
         with open("results/tb_aes_fcover.txt", "a", encoding="utf-8") as f:
-            f.write(get_coverage_report(details=True))
-        vsc.write_coverage_db("results/tb_aes_fcover.xml")
+            f.write(vsc.get_coverage_report(details=True))
+        vsc.write_coverage_db(f"results/tb_aes_fcover{RUN_ID}.xml")
 
 
 # AES test bench environment
 # Creates instances of components and connects them
+# The interface is configured by VAI_PATH, VAI_PREFIX & CLK_PERIOD_NS
 class AesEnv(uvm_env):
     def build_phase(self):
+        self.bfm = VaiBfmFactory().get(
+            get_config(self, "VAI_PATH", ""),
+            get_config(self, "VAI_PREFIX", ""),
+            get_config(self, "CLK_PERIOD_NS", PERIOD_NS),
+        )
+        ConfigDB().set(self, "*", "BFM", self.bfm)
         self.seqr = uvm_sequencer("seqr", self)
-        ConfigDB().set(None, "*", "SEQR", self.seqr)
         self.driver = Driver.create("driver", self)
         self.input_mon = Monitor("input_mon", self, "get_input")
-        self.coverage = Coverage("coverage", self)
+        if COVERAGE:
+            self.coverage = Coverage("coverage", self)
         self.scoreboard = Scoreboard("scoreboard", self)
 
     def connect_phase(self):
         self.driver.seq_item_port.connect(self.seqr.seq_item_export)
         self.input_mon.ap.connect(self.scoreboard.input_export)
-        self.input_mon.ap.connect(self.coverage.analysis_export)
+        if COVERAGE:
+            self.input_mon.ap.connect(self.coverage.analysis_export)
         self.driver.ap.connect(self.scoreboard.output_export)
+
+    def flush(self):
+        flush(self.input_mon.ap)
+        flush(self.driver.ap)
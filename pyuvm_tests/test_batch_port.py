@@ -0,0 +1,82 @@
+import pytest
+import Tlm
+from pyuvm import (
+    ConfigDB,
+    uvm_build_phase,
+    uvm_component,
+    uvm_connect_phase,
+    uvm_root,
+)
+
+import tb_aes
+from BatchPort import BatchAnalysisFifo, BatchAnalysisPort, BatchSubscriber
+
+# Builds the testbench without simulator, run with PYTHONPATH=../tests
+
+
+class Recorder(BatchSubscriber):
+    def __init__(self, name, parent):
+        super().__init__(name, parent)
+        self.items = []
+        self.batches = []
+
+    def write(self, tt):
+        self.items.append(tt)
+
+    def write_batch(self, items):
+        self.batches.append(list(items))
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    yield
+    uvm_root().clear_children()
+    ConfigDB().clear()
+
+
+def build(top):
+    uvm_build_phase.traverse(top)
+    uvm_connect_phase.traverse(top)
+    return top
+
+
+def test_batch_delivery():
+    top = uvm_component("top", None)
+    ap = BatchAnalysisPort("ap", top, size=3)
+    fifo = BatchAnalysisFifo("fifo", top)
+    recorder = Recorder("recorder", top)
+    ap.connect(fifo.analysis_export)
+    ap.connect(recorder.analysis_export)
+    for i in range(4):
+        ap.write(i)
+    assert recorder.batches == [[0, 1, 2]]
+    ap.flush()
+    assert recorder.batches == [[0, 1, 2], [3]]
+    assert recorder.items == []
+    assert [fifo.get_export.try_get()[1] for _ in range(fifo.used())] == [0, 1, 2, 3]
+
+
+@pytest.fixture
+def tlm(monkeypatch):
+    monkeypatch.setattr(Tlm, "ENABLED", True)
+
+
+def test_build_env(tlm):
+    env = build(tb_aes.AesEnv("env", None))
+    assert isinstance(env.coverage.analysis_export, BatchSubscriber.uvm_AnalysisImp)
+    assert isinstance(env.scoreboard.input_export, BatchAnalysisFifo.uvm_AnalysisExport)
+
+
+@pytest.mark.parametrize("batch", [0, 4])
+def test_env_delivery(tlm, monkeypatch, batch):
+    # Coverage sampling needs pyvsc
+    monkeypatch.setattr(tb_aes, "COVERAGE", False)
+    ConfigDB().set(None, "*", "BATCH_SIZE", batch)
+    env = build(tb_aes.AesEnv("env", None))
+    assert isinstance(env.input_mon.ap, BatchAnalysisPort) == bool(batch)
+    for i in range(5):
+        env.input_mon.ap.write(i)
+        env.driver.ap.write(i)
+    env.flush()
+    assert env.scoreboard.input_fifo.used() == 5
+    assert env.scoreboard.output_fifo.used() == 5
@@ -0,0 +1,186 @@
+import argparse
+import json
+import logging
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from HdlClock import PERIOD_NS
+
+
+# Benchmark results are only recorded with BENCHMARK=1
+ENABLED = os.environ.get("BENCHMARK", "0") not in ("", "0")
+HISTORY = os.environ.get("BENCHMARK_HISTORY",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmark_history.json"))
+
+# Benchmarks & the make invocations which run them
+BENCHES = {
+    "tb_uarttx":          ("tests", {"DUT": "uarttx"}),
+    "tb_uartrx":          ("tests", {"DUT": "uartrx"}),
+    "tb_wishbone":        ("tests", {"DUT": "wishbone"}),
+    "tb_aes":             ("tests", {"DUT": "aes"}),
+    "pyuvm_AesTest":      ("pyuvm_tests", {"DUT": "aes", "TESTCASE": "AesTest"}),
+    "pyuvm_ParallelTest": ("pyuvm_tests", {"DUT": "aes", "TESTCASE": "ParallelTest"}),
+}
+
+
+def transactions(default):
+    """Number of transactions a test runs, can be set with TRANSACTIONS"""
+    return int(os.environ.get("TRANSACTIONS", default))
+
+
+def load_history(path=HISTORY):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+class Benchmark:
+    """Throughput & Python/simulator time split of one testbench run
+
+    Use it as context manager, which undoes start() also if the test
+    fails before stop().
+    """
+
+    def __init__(self, name, period_ns=PERIOD_NS):
+        self.log = logging.getLogger(f"cocotb.benchmark.{name}")
+        self.name = name
+        self._period = period_ns
+        self._python = 0.0
+        self._scheduler = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self._restore()
+        return False
+
+    def _timed_event_loop(self, trigger):
+        start = time.perf_counter()
+        try:
+            self._event_loop(trigger)
+        finally:
+            self._python += time.perf_counter() - start
+
+    def start(self):
+        import cocotb
+        from cocotb.utils import get_sim_time
+
+        # All Python code of a testbench runs inside the scheduler event loop
+        self._scheduler = cocotb.scheduler
+        self._event_loop = self._scheduler._event_loop
+        self._scheduler._event_loop = self._timed_event_loop
+        self._python = 0.0
+        self._sim_start = get_sim_time("ns")
+        self._wall_start = time.perf_counter()
+        return self
+
+    def _restore(self):
+        """Remove the timed event loop of start()"""
+        if self._scheduler is not None:
+            del self._scheduler._event_loop
+            self._scheduler = None
+
+    def stop(self, count):
+        """Stop measurement after count transactions & record the results"""
+        from cocotb.utils import get_sim_time
+
+        wall = time.perf_counter() - self._wall_start
+        sim = get_sim_time("ns") - self._sim_start
+        self._restore()
+
+        result = {
+            "bench": self.name,
+            "run": os.environ.get("BENCHMARK_RUN", ""),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "transactions": count,
+            "sim_ns": sim,
+            "cycles_per_transaction": sim / self._period / count if count else 0.0,
+            "wall_s": wall,
+            "transactions_per_s": count / wall,
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "python_s": self._python,
+            "simulator_s": max(wall - self._python, 0.0),
+        }
+        self.log.info(
+            f"{count} transactions, {result['cycles_per_transaction']:.1f} cycles/transaction, "
+            f"{result['transactions_per_s']:.1f} transactions/s, "
+            f"{100 * self._python / wall:.1f} % Python, peak RSS {result['peak_rss_kb']} kB")
+
+        if ENABLED:
+            history = load_history()
+            history.append(result)
+            with open(HISTORY, "w", encoding="utf-8") as f:
+                json.dump(history, f, indent=1)
+        return result
+
+
+def check(history, run, max_slowdown, max_cycles, baseline_runs):
+    """Compare results of run against the median of former runs
+
+    Returns list of regression messages, empty if there are none.
+    """
+    regressions = []
+    for result in (r for r in history if r["run"] == run):
+        former = [r for r in history
+                  if r["run"] != run
+                  and r["bench"] == result["bench"]
+                  and r["transactions"] == result["transactions"]][-baseline_runs:]
+        if not former:
+            continue
+        tps = statistics.median(r["transactions_per_s"] for r in former)
+        cpt = statistics.median(r["cycles_per_transaction"] for r in former)
+        if result["transactions_per_s"] < tps * (1 - max_slowdown):
+            regressions.append(
+                f"{result['bench']}: {result['transactions_per_s']:.1f} transactions/s, "
+                f"baseline {tps:.1f}")
+        if result["cycles_per_transaction"] > cpt * (1 + max_cycles):
+            regressions.append(
+                f"{result['bench']}: {result['cycles_per_transaction']:.1f} cycles/transaction, "
+                f"baseline {cpt:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run testbench benchmarks")
+    parser.add_argument("benches", nargs="*", default=list(BENCHES),
+        help=f"benchmarks to run, default all of {', '.join(BENCHES)}")
+    parser.add_argument("-n", "--transactions", type=int, nargs="+", default=[100],
+        help="transaction counts to run every benchmark with")
+    parser.add_argument("--max-slowdown", type=float, default=0.2,
+        help="allowed drop of transactions/s against the baseline")
+    parser.add_argument("--max-cycles", type=float, default=0.05,
+        help="allowed growth of simulated cycles/transaction against the baseline")
+    parser.add_argument("--baseline-runs", type=int, default=5,
+        help="number of former runs the baseline is the median of")
+    args = parser.parse_args()
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    run = time.strftime("%Y%m%d%H%M%S")
+    failed = False
+    for bench in args.benches:
+        directory, variables = BENCHES[bench]
+        for count in args.transactions:
+            env = dict(os.environ, BENCHMARK="1", BENCHMARK_RUN=run,
+                       BENCHMARK_HISTORY=os.path.abspath(HISTORY),
+                       TRANSACTIONS=str(count), COCOTB_LOG_LEVEL="WARNING")
+            make = ["make", "-C", os.path.join(root, directory)]
+            make += [f"{k}={v}" for k, v in variables.items()]
+            make += ["COCOTB_LOG_LEVEL=WARNING"]
+            print(f"Running {bench} with {count} transactions")
+            failed |= subprocess.run(make, env=env).returncode != 0
+
+    regressions = check(load_history(), run, args.max_slowdown, args.max_cycles,
+                        args.baseline_runs)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import argparse
+import contextlib
+import fcntl
+import glob
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+
+
+# Shared by tests & pyuvm_tests, can be moved with GHDL_CACHE_DIR
+CACHE_DIR = os.environ.get("GHDL_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "build", "ghdl"))
+
+# Lock file in each cache directory, held while analysing into it
+LOCK = ".lock"
+
+
+def _ghdl_version():
+    try:
+        _version = subprocess.run(["ghdl", "--version"], capture_output=True, text=True)
+        return _version.stdout.splitlines()[0]
+    except (OSError, IndexError):
+        return "unknown"
+
+
+def cache_key(libraries, args=()):
+    """Content hash of VHDL libraries & compile arguments
+
+    libraries is a list of (library, sources) in analysis order. Top level
+    generics are set at simulation run time, so they aren't part of the key.
+    """
+    _hash = hashlib.sha1()
+    _hash.update(_ghdl_version().encode())
+    _hash.update(" ".join(args).encode())
+    for library, sources in libraries:
+        _hash.update(f"library {library}".encode())
+        for source in sources:
+            _hash.update(f"file {os.path.basename(source)}".encode())
+            with open(source, "rb") as f:
+                _hash.update(f.read())
+    return _hash.hexdigest()[:16]
+
+
+def cache_path(libraries, args=()):
+    """Return (and create) the cache directory of the given libraries"""
+    _path = os.path.abspath(os.path.join(CACHE_DIR, cache_key(libraries, args)))
+    os.makedirs(_path, exist_ok=True)
+    return _path
+
+
+@contextlib.contextmanager
+def locked(path):
+    """Hold the lock of cache directory path, serialises its writers
+
+    Compatible with flock(1), which the Makefiles use.
+    """
+    with open(os.path.join(path, LOCK), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield path
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def link(path, name):
+    """Point the local build directory name to the cache path
+
+    The link is replaced atomically, so concurrent runs don't race on it.
+    """
+    if os.path.islink(name):
+        if os.readlink(name) == path:
+            return
+    elif os.path.isdir(name):
+        # Build directory of former, uncached runs
+        shutil.rmtree(name, ignore_errors=True)
+    _tmp = f"{name}.{os.getpid()}.tmp"
+    os.symlink(path, _tmp)
+    os.replace(_tmp, name)
+
+
+def expand(sources):
+    """Expand glob patterns of sources to files, in the order given"""
+    return [s for source in sources for s in sorted(glob.glob(source))
+            if os.path.isfile(s)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GHDL build cache")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    _path = sub.add_parser("path", help="print cache directory of sources")
+    _path.add_argument("--args", default="", help="compile arguments")
+    _path.add_argument("--lib", nargs="+", action="append", default=[],
+        metavar=("LIBRARY", "SOURCE"), help="library name & its sources")
+    _path.add_argument("--link", help="local build directory to link to the cache")
+    sub.add_parser("clean", help="remove all cached builds")
+    args = parser.parse_args()
+
+    if args.cmd == "clean":
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        return 0
+
+    libraries = [(lib[0], expand(lib[1:])) for lib in args.lib]
+    path = cache_path(libraries, args.args.split())
+    if args.link:
+        link(path, args.link)
+    print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+class Fixture:
+    """Module scoped testbench fixture
+
+    The environment (BFMs, models, covergroups) is built once in the
+    constructor and shared by all tests of the module. start() prepares
+    each test: cocotb kills the coroutines of a test at its end, so
+    background coroutines like clocks & monitors are (re)started there,
+    and stop() kills them before the next test starts.
+
+    The DUT ports listed in ports are resolved once by resolve() and
+    used through the cached handles.
+    """
+
+    _fixtures = {}
+    ports = ()
+
+    @classmethod
+    async def setup(cls, dut):
+        """Return the fixture of the module, started for the calling test"""
+        _fixture = Fixture._fixtures.get(cls)
+        if _fixture is None:
+            _fixture = Fixture._fixtures[cls] = cls(dut)
+        else:
+            _fixture.stop()
+        await _fixture.start()
+        return _fixture
+
+    def resolve(self, dut):
+        """Set the declared ports as attributes, all missing ones reported at once"""
+        _missing = [name for name in self.ports if not hasattr(dut, name)]
+        if _missing:
+            raise AttributeError(f"Ports {', '.join(_missing)} not found in {dut._path}")
+        for name in self.ports:
+            setattr(self, name, getattr(dut, name))
+
+    async def start(self):
+        pass
+
+    def stop(self):
+        pass
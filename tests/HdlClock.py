@@ -0,0 +1,178 @@
+import argparse
+import os
+import re
+import sys
+from BuildCache import expand
+
+
+# Clock generated by a VHDL wrapper top level, set with HDL_CLOCK=1
+ENABLED = os.environ.get("HDL_CLOCK") == "1"
+
+SUFFIX = "_hdlclk"
+
+# Period of the cocotb & HDL clocks, set with CLK_PERIOD_NS
+PERIOD_NS = int(os.environ.get("CLK_PERIOD_NS", "10"))
+
+
+def start_clock(signal, period_ns=PERIOD_NS):
+    """Start a cocotb clock on signal, unless it is generated in HDL
+
+    Returns the clock task, None with HDL clock. cocotb is imported here,
+    so the generator runs without it.
+    """
+    import cocotb
+    from cocotb.clock import Clock
+    if ENABLED:
+        signal._log.info(f"Clock {signal._name} generated in HDL")
+        return None
+    clock = Clock(signal, period_ns, units="ns")
+    return cocotb.start_soon(clock.start())
+
+
+def _block(text, keyword, start):
+    """Contents of 'keyword ( ... )' from start on, None if not there"""
+    match = re.compile(rf"\s*\b{keyword}\s*\(", re.I).match(text, start)
+    if not match:
+        return None, start
+    depth = 1
+    for pos in range(match.end(), len(text)):
+        if text[pos] == "(":
+            depth += 1
+        elif text[pos] == ")":
+            depth -= 1
+            if not depth:
+                _end = text.index(";", pos) + 1
+                return text[match.end():pos], _end
+    raise ValueError(f"Unbalanced {keyword} clause")
+
+
+def _split(block):
+    """Split an interface list into (names, declaration) per element"""
+    _elements = []
+    depth = 0
+    part = ""
+    for char in block + ";":
+        depth += (char == "(") - (char == ")")
+        if char == ";" and not depth:
+            if part.strip():
+                names, decl = part.split(":", 1)
+                _elements.append(([n.strip() for n in names.split(",")], " ".join(decl.split())))
+            part = ""
+        else:
+            part += char
+    return _elements
+
+
+def parse(sources, entity):
+    """Return context clause, generics & ports of entity
+
+    Generics are (name, declaration), ports (name, mode, declaration).
+    """
+    for source in sources:
+        with open(source, encoding="utf-8", errors="replace") as f:
+            text = re.sub(r"--[^\n]*", "", f.read())
+        match = re.search(rf"\bentity\s+{entity}\s+is\s*", text, re.I)
+        if not match:
+            continue
+        context = re.findall(r"^\s*((?:library|use|context)\s[^;]+;)", text[:match.start()],
+                             re.I | re.M)
+        _generics, pos = _block(text, "generic", match.end())
+        _ports, pos = _block(text, "port", pos)
+        generics = [(n, d) for names, d in _split(_generics or "") for n in names]
+        ports = []
+        for names, decl in _split(_ports or ""):
+            mode, decl = (decl.split(None, 1) + [""])[:2]
+            if mode.lower() not in ("in", "out", "inout", "buffer"):
+                mode, decl = "in", f"{mode} {decl}"
+            ports.extend((n, mode.lower(), decl.strip()) for n in names)
+        return context, generics, ports
+    raise ValueError(f"Entity {entity} not found in sources")
+
+
+def wrapper(sources, entity, clock=None, period_ns=PERIOD_NS):
+    """VHDL of the wrapper top level with the clock generated in HDL
+
+    The wrapper has the ports of entity, the clock as output of the same
+    name, so testbenches & BFMs use it unchanged. The ClkPeriod generic
+    defaults to period_ns.
+    """
+    context, generics, ports = parse(sources, entity)
+    if clock is None:
+        clocks = [n for n, mode, _ in ports if mode == "in" and re.search("clk|clock", n, re.I)]
+        if not clocks:
+            raise ValueError(f"No clock port found in entity {entity}")
+        clock = clocks[0]
+    _top = f"{entity}{SUFFIX}"
+    _generics = [f"    {n} : {d}" for n, d in generics] + [f"    ClkPeriod : time := {period_ns} ns"]
+    _ports = [f"    {n} : out std_logic := '0'" if n == clock else f"    {n} : {m} {d}"
+              for n, m, d in ports]
+    _context = [c.strip() for c in context]
+    if "use ieee.std_logic_1164.all;" not in (c.lower() for c in _context):
+        _context = ["library ieee;", "use ieee.std_logic_1164.all;"] + _context
+    _lines = [
+        f"-- Generated by HdlClock.py, {entity} with clock {clock} generated in HDL",
+        "",
+        *_context,
+        "",
+        f"entity {_top} is",
+        "  generic (",
+        ";\n".join(_generics),
+        "  );",
+    ]
+    if _ports:
+        _lines += ["  port (", ";\n".join(_ports), "  );"]
+    _lines += [
+        f"end entity {_top};",
+        "",
+        f"architecture sim of {_top} is",
+        "begin",
+        "",
+        f"  {clock} <= not {clock} after ClkPeriod / 2;",
+        "",
+        f"  i_{entity} : entity work.{entity}",
+    ]
+    if generics:
+        _lines += ["    generic map (",
+                   ",\n".join(f"      {n} => {n}" for n, _ in generics), "    )"]
+    if ports:
+        _lines += ["    port map (",
+                   ",\n".join(f"      {n} => {n}" for n, _, _ in ports), "    )"]
+    _lines[-1] += ";"
+    _lines += ["", "end architecture sim;", ""]
+    return "\n".join(_lines)
+
+
+def generate(sources, entity, out, clock=None, period_ns=PERIOD_NS):
+    """Write the wrapper to out, only if changed, return its path"""
+    _vhdl = wrapper(expand(sources), entity, clock, period_ns)
+    _path = os.path.abspath(os.path.join(out, f"{entity}{SUFFIX}.vhd"))
+    os.makedirs(out, exist_ok=True)
+    if os.path.isfile(_path):
+        with open(_path, encoding="utf-8") as f:
+            if f.read() == _vhdl:
+                return _path
+    with open(_path, "w", encoding="utf-8") as f:
+        f.write(_vhdl)
+    return _path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a top level with HDL clock")
+    parser.add_argument("entity", help="entity to wrap")
+    parser.add_argument("sources", nargs="+", help="VHDL sources, wildcards allowed")
+    parser.add_argument("-c", "--clock", help="clock port, default first input *clk*")
+    parser.add_argument("-o", "--out", default="hdlclk", help="output directory")
+    parser.add_argument("-p", "--period", type=int, default=PERIOD_NS,
+        help=f"clock period in ns, default CLK_PERIOD_NS or {PERIOD_NS}")
+    args = parser.parse_args()
+
+    try:
+        print(generate(args.sources, args.entity, args.out, args.clock, args.period))
+    except ValueError as e:
+        print(f"HdlClock: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
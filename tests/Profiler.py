@@ -0,0 +1,123 @@
+import functools
+import logging
+import os
+import time
+import types
+from cocotb.utils import get_sim_time
+
+
+# Profiling is opt-in, enable it with BFM_PROFILE=1
+ENABLED = os.environ.get("BFM_PROFILE", "0") not in ("", "0")
+
+
+@types.coroutine
+def _suspend(trigger):
+    """Pass a trigger yielded by a profiled coroutine on to the scheduler"""
+    return (yield trigger)
+
+
+class Profiler:
+    """Wakeup & Python time profiler for BFM coroutines"""
+
+    def __init__(self):
+        self.log = logging.getLogger("cocotb.profiler")
+        self._stack = []
+        self._child = [0.0]
+        self.reset()
+
+    def reset(self):
+        # Stack of profiled coroutines -> [wakeups, self time in s]
+        self._stats = {}
+        self._transactions = 0
+        self._wall_start = None
+        self._sim_start = None
+
+    def _start(self):
+        self._wall_start = time.perf_counter()
+        self._sim_start = get_sim_time("ns")
+
+    def _account(self, start):
+        elapsed = time.perf_counter() - start
+        child = self._child.pop()
+        self._child[-1] += elapsed
+        stats = self._stats.setdefault(";".join(self._stack), [0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed - child
+        self._stack.pop()
+
+    async def run(self, coro, name, transaction=False):
+        """Drive coro & account each of its wakeups to name"""
+        if self._wall_start is None:
+            self._start()
+        resume, value = coro.send, None
+        while True:
+            self._stack.append(name)
+            self._child.append(0.0)
+            start = time.perf_counter()
+            try:
+                trigger = resume(value)
+            except StopIteration as e:
+                if transaction:
+                    self._transactions += 1
+                return e.value
+            finally:
+                self._account(start)
+            try:
+                resume, value = coro.send, await _suspend(trigger)
+            except GeneratorExit:
+                # Task was killed
+                coro.close()
+                raise
+            except BaseException as e:
+                resume, value = coro.throw, e
+
+    def write_report(self, name):
+        """Write summary & flamegraph profile (collapsed stacks) to results"""
+        if self._wall_start is None:
+            return
+        wall = time.perf_counter() - self._wall_start
+        sim = get_sim_time("ns") - self._sim_start
+        python = sum(s[1] for s in self._stats.values())
+
+        with open(f"results/{name}_profile.txt", "w", encoding="utf-8") as f:
+            f.write(f"Sim time:     {sim:.2f} ns\n")
+            f.write(f"Wall time:    {wall:.3f} s\n")
+            f.write(f"Ratio:        {sim / wall:.2f} ns/s\n")
+            f.write(f"BFM Python:   {python:.3f} s ({100 * python / wall:.1f} %)\n")
+            f.write(f"Transactions: {self._transactions} "
+                    f"({self._transactions / wall:.2f} /s)\n\n")
+            f.write(f"{'Coroutine':60}{'Wakeups':>10}{'Python s':>12}{'us/wakeup':>12}\n")
+            for key, (wakeups, secs) in sorted(self._stats.items(),
+                                               key=lambda x: x[1][1], reverse=True):
+                f.write(f"{key:60}{wakeups:10}{secs:12.4f}{1e6 * secs / wakeups:12.2f}\n")
+
+        with open(f"results/{name}_profile.folded", "w", encoding="utf-8") as f:
+            for key, (_, secs) in self._stats.items():
+                f.write(f"{name};{key} {round(1e6 * secs)}\n")
+
+        self.log.info(f"Profile written to results/{name}_profile.txt")
+        self.reset()
+
+
+profiler = Profiler()
+
+
+def profiled(func=None, *, transaction=False):
+    """Profile an async BFM method, no-op unless BFM_PROFILE is set
+
+    Calls of methods declared as transaction are counted as transactions.
+    """
+    if func is None:
+        return functools.partial(profiled, transaction=transaction)
+    if not ENABLED:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        name = func.__qualname__
+        # Tell instances of the same BFM class apart by their logger
+        if self.log.name.startswith("cocotb."):
+            name += f"@{self.log.name[7:]}"
+        return profiler.run(func(self, *args, **kwargs), name, transaction)
+
+    return wrapper
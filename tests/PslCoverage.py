@@ -0,0 +1,180 @@
+import argparse
+import json
+import re
+import sys
+import xml.etree.ElementTree as ET
+from BuildCache import expand
+
+
+# Start of the directive list in a GHDL PSL report
+_DETAILS = re.compile(r'"details"\s*:\s*\[')
+_SEPARATOR = re.compile(r"\s*,?\s*")
+
+
+def directives(path):
+    """Yield the directives of a GHDL PSL report (--psl-report) one by one
+
+    Entries are decoded one at a time from the details list, so a report
+    truncated by a crashed simulation still yields its complete entries.
+    """
+    with open(path, encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    match = _DETAILS.search(text)
+    if not match:
+        return
+    decoder = json.JSONDecoder()
+    pos = match.end()
+    while True:
+        pos = _SEPARATOR.match(text, pos).end()
+        if pos >= len(text) or text[pos] == "]":
+            return
+        try:
+            entry, pos = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            return
+        yield entry
+
+
+class PslCoverage:
+    """PSL assert & cover counts merged over many GHDL runs
+
+    Directives are identified by kind, name, file & line. Per directive
+    the finish counts are summed, and the runs which hit it (covers) or
+    failed it (asserts) are counted.
+    """
+
+    def __init__(self):
+        # (directive, name, file, line) -> [count, runs, runs hit, runs failed]
+        self.directives = {}
+        self.reports = 0
+        self.empty = []
+
+    def add(self, path):
+        """Merge one report, return the number of directives it has"""
+        _directives = self.directives
+        _count = 0
+        for entry in directives(path):
+            key = (entry.get("directive", "?"), entry.get("name", "?"),
+                   entry.get("file", "?"), entry.get("line", 0))
+            stats = _directives.get(key)
+            if stats is None:
+                stats = _directives[key] = [0, 0, 0, 0]
+            count = entry.get("count", 0)
+            status = entry.get("status", "")
+            stats[0] += count
+            stats[1] += 1
+            stats[2] += status == "covered" or (count > 0 and status != "failed")
+            stats[3] += status == "failed"
+            _count += 1
+        self.reports += 1
+        if not _count:
+            self.empty.append(path)
+        return _count
+
+    def uncovered(self):
+        """Covers never hit in any run"""
+        return sorted(key for key, stats in self.directives.items()
+                      if key[0] == "cover" and not stats[2])
+
+    def failed(self):
+        """Asserts failed in at least one run"""
+        return sorted(key for key, stats in self.directives.items()
+                      if key[0] != "cover" and stats[3])
+
+    def report(self):
+        _lines = [f"PSL coverage of {self.reports} reports, {len(self.directives)} directives",
+                  f"{'Directive':10}{'Name':50}{'Count':>10}{'Runs':>8}{'Hit':>8}{'Failed':>8}"]
+        for key, (count, runs, hit, failed) in sorted(self.directives.items()):
+            _lines.append(f"{key[0]:10}{key[1]:50}{count:10}{runs:8}{hit:8}{failed:8}")
+        for key in self.uncovered():
+            _lines.append(f"NOT COVERED: {key[1]} ({key[2]}:{key[3]})")
+        for key in self.failed():
+            _lines.append(f"FAILED: {key[1]} ({key[2]}:{key[3]})")
+        for path in self.empty:
+            _lines.append(f"NO DIRECTIVES: {path}")
+        return "\n".join(_lines)
+
+
+class VscCoverage:
+    """pyvsc functional coverage from UCIS XML (vsc.write_coverage_db)
+
+    The XML is parsed incrementally and merged over files per covergroup
+    instance, coverpoint (or cross) and bin.
+    """
+
+    def __init__(self):
+        # (covergroup, coverpoint, bin) -> count
+        self.bins = {}
+        self.files = 0
+
+    def add(self, path):
+        _group = _point = _bin = None
+        for event, elem in ET.iterparse(path, events=("start", "end")):
+            tag = elem.tag.rsplit("}", 1)[-1]
+            if event == "start":
+                if tag == "cgInstance":
+                    _group = elem.get("name")
+                elif tag in ("coverpoint", "cross"):
+                    _point = elem.get("name")
+                elif tag in ("coverpointBin", "crossBin"):
+                    _bin = elem.get("name")
+            elif tag == "contents" and _bin is not None:
+                key = (_group, _point, _bin)
+                self.bins[key] = self.bins.get(key, 0) + int(elem.get("coverageCount", 0))
+            elif tag in ("coverpointBin", "crossBin"):
+                _bin = None
+                elem.clear()
+        self.files += 1
+
+    def summary(self):
+        """(covergroup, coverpoint) -> (bins hit, bins)"""
+        _summary = {}
+        for (group, point, _), count in self.bins.items():
+            hit, total = _summary.get((group, point), (0, 0))
+            _summary[(group, point)] = (hit + bool(count), total + 1)
+        return _summary
+
+    def report(self):
+        _lines = [f"Functional coverage of {self.files} pyvsc databases",
+                  f"{'Covergroup':30}{'Coverpoint':30}{'Bins hit':>12}{'Coverage':>10}"]
+        for (group, point), (hit, total) in sorted(self.summary().items()):
+            _lines.append(f"{group:30}{point:30}{f'{hit}/{total}':>12}"
+                          f"{100 * hit / total:9.1f}%")
+        return "\n".join(_lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge GHDL PSL & pyvsc coverage reports")
+    parser.add_argument("reports", nargs="+",
+        help="PSL JSON reports & pyvsc XML databases, wildcards allowed")
+    parser.add_argument("-o", "--out", help="write the merged report to this file")
+    parser.add_argument("--strict", action="store_true",
+        help="exit with error if a cover was never hit")
+    args = parser.parse_args()
+
+    paths = expand(args.reports)
+    if not paths:
+        print(f"PslCoverage: no reports found for {' '.join(args.reports)}", file=sys.stderr)
+        return 1
+    psl = PslCoverage()
+    vsc = VscCoverage()
+    for path in paths:
+        if path.endswith(".xml"):
+            vsc.add(path)
+        else:
+            psl.add(path)
+
+    _report = psl.report()
+    if vsc.files:
+        _report += "\n\n" + vsc.report()
+    print(_report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(_report + "\n")
+    if psl.failed() or (args.strict and psl.uncovered()):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
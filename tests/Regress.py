@@ -0,0 +1,227 @@
+import argparse
+import ast
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import BuildCache
+from Runner import DUTS, LIBRARIES, ROOT, Runner, select
+
+
+HISTORY = os.environ.get("REGRESS_HISTORY", os.path.join(ROOT, "regress_history.json"))
+TESTS = os.path.join(ROOT, "tests")
+
+# Changes to these files affect all tests
+COMMON = [os.path.join(TESTS, name) for name in ("Runner.py", "BuildCache.py", "HdlClock.py")]
+
+# Design units a VHDL file defines & references
+_DEFINES = re.compile(r"^\s*(?:entity|package|configuration)\s+(\w+)\s+(?:is|of)\b"
+                      r"|^\s*package\s+body\s+(\w+)\s+is\b"
+                      r"|^\s*architecture\s+\w+\s+of\s+(\w+)\s+is\b", re.I | re.M)
+_REFERENCES = re.compile(r"\bentity\s+\w+\.(\w+)|\buse\s+\w+\.(\w+)\.\w+"
+                         r"|\bcomponent\s+(\w+)|:\s*(\w+)\s+(?:generic|port)\s+map\b", re.I)
+
+
+def _units(pattern, text):
+    return {name.lower() for match in pattern.findall(text) for name in match if name}
+
+
+def rtl_dependencies(toplevel, sources):
+    """VHDL files the toplevel depends on, all sources if it isn't found"""
+    _files = {}
+    _defined = {}
+    for source in sources:
+        with open(source, encoding="utf-8", errors="replace") as f:
+            text = re.sub(r"--[^\n]*", "", f.read())
+        _files[source] = _units(_REFERENCES, text)
+        for unit in _units(_DEFINES, text):
+            _defined.setdefault(unit, []).append(source)
+    if toplevel.lower() not in _defined:
+        return set(sources)
+    _deps = set()
+    _todo = [toplevel.lower()]
+    _seen = set(_todo)
+    while _todo:
+        for source in _defined.get(_todo.pop(), []):
+            if source not in _deps:
+                _deps.add(source)
+                _todo.extend(_files[source] - _seen)
+                _seen |= _files[source]
+    return _deps
+
+
+def _imports(path):
+    """Top level names of modules imported or lazily imported by path"""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            yield from (alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            yield node.module.split(".")[0]
+        elif (isinstance(node, ast.Call) and getattr(node.func, "id", None) == "lazy_import"
+              and node.args and isinstance(node.args[0], ast.Constant)):
+            yield node.args[0].value.split(".")[0]
+
+
+def python_dependencies(module, directory):
+    """Python files of the repo a testbench module imports, transitively
+
+    Modules are looked up like the simulator does, in the testbench
+    directory first and then in tests/.
+    """
+    _path = [directory, TESTS]
+    _deps = set()
+    _todo = [module]
+    while _todo:
+        name = _todo.pop()
+        for directory in _path:
+            _file = os.path.join(directory, f"{name}.py")
+            if os.path.isfile(_file):
+                break
+        else:
+            # Not part of the repo
+            continue
+        if _file not in _deps:
+            _deps.add(_file)
+            _todo.extend(_imports(_file))
+    return _deps
+
+
+def dependencies():
+    """Files each DUT's tests depend on, keyed by DUT name"""
+    _sources = [s for _, sources in LIBRARIES for s in BuildCache.expand(sources)]
+    return {name: rtl_dependencies(dut.toplevel, _sources)
+            | python_dependencies(dut.module, dut.directory) | set(COMMON)
+            for name, dut in DUTS.items()}
+
+
+def changed_files(base="HEAD"):
+    """Files changed against base, including uncommitted & untracked ones"""
+    _diff = subprocess.run(["git", "diff", "--name-only", base], cwd=ROOT,
+                           capture_output=True, text=True, check=True).stdout.split()
+    _new = subprocess.run(["git", "ls-files", "--others", "--exclude-standard"], cwd=ROOT,
+                          capture_output=True, text=True, check=True).stdout.split()
+    return {os.path.join(ROOT, name) for name in _diff + _new}
+
+
+def load_history(path=HISTORY):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def plan(changed, patterns=(), history=None):
+    """Return the affected tests as (dut name, test, reason), longest first
+
+    Tests without recorded runtime come first, as they may be long.
+    """
+    history = load_history() if history is None else history
+    _deps = dependencies()
+    _changed = {os.path.abspath(c) for c in changed}
+    _plan = []
+    for dut_name, test in select(patterns):
+        _hits = sorted(_changed & _deps[dut_name])
+        if _hits:
+            _plan.append((dut_name, test, os.path.relpath(_hits[0], ROOT)))
+    return sorted(_plan, key=lambda p: -history.get(f"{p[0]}.{p[1]}", float("inf")))
+
+
+def _result_of(log, name):
+    """Result of name in the summary a Runner process printed to log"""
+    with open(log, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            fields = line[len(name):].split() if line.startswith(name) else []
+            if fields and fields[0] in ("PASS", "FAIL", "TIMEOUT"):
+                return fields[0]
+    # Runner crashed before its summary
+    return "FAIL"
+
+
+def run(tests, jobs=1, timeout=None, seed=None):
+    """Run tests in order, return [(name, result, duration)]
+
+    With jobs > 1 the DUTs are built first and the tests run in parallel
+    Runner processes, which only simulate. Their output is written to
+    results/<module>_<test>.log of the testbench directory.
+    """
+    runner = Runner(timeout, seed)
+    _results = []
+    if jobs <= 1:
+        for dut_name, test in tests:
+            start = time.perf_counter()
+            result = runner.test(DUTS[dut_name], test)
+            _results.append((f"{dut_name}.{test}", result, time.perf_counter() - start))
+        return _results
+
+    for dut_name in dict.fromkeys(d for d, _ in tests):
+        runner.build(DUTS[dut_name])
+    _args = [sys.executable, os.path.join(TESTS, "Runner.py"), "--prebuilt"]
+    _args += ["--timeout", str(timeout)] if timeout else []
+    _args += ["--seed", str(seed)] if seed is not None else []
+    _todo = list(tests)
+    _running = {}
+    while _todo or _running:
+        while _todo and len(_running) < jobs:
+            dut_name, test = _todo.pop(0)
+            name = f"{dut_name}.{test}"
+            dut = DUTS[dut_name]
+            os.makedirs(os.path.join(dut.directory, "results"), exist_ok=True)
+            log = os.path.join(dut.directory, "results", f"{dut.module}_{test}.log")
+            with open(log, "w", encoding="utf-8") as f:
+                process = subprocess.Popen(_args + [name], stdout=f, stderr=subprocess.STDOUT)
+            _running[name] = (process, log, time.perf_counter())
+        time.sleep(0.1)
+        for name, (process, log, start) in list(_running.items()):
+            if process.poll() is not None:
+                del _running[name]
+                _result = _result_of(log, name)
+                if _result != "PASS":
+                    print(f"{name} {_result}, see {os.path.relpath(log, ROOT)}")
+                _results.append((name, _result, time.perf_counter() - start))
+    return _results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the tests affected by changed files")
+    parser.add_argument("patterns", nargs="*",
+        help="limit to tests as <dut>.<test> or <test>, wildcards allowed")
+    parser.add_argument("-b", "--base", default="HEAD",
+        help="git revision to diff against, default HEAD")
+    parser.add_argument("-f", "--files", nargs="+", help="changed files instead of git diff")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="print the plan only")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="tests run in parallel")
+    parser.add_argument("-t", "--timeout", type=float,
+        help="wall clock timeout per test in seconds")
+    parser.add_argument("-s", "--seed", type=int, help="random seed")
+    args = parser.parse_args()
+
+    history = load_history()
+    changed = args.files if args.files else changed_files(args.base)
+    tests = plan(changed, args.patterns, history)
+    for dut_name, test, reason in tests:
+        _last = history.get(f"{dut_name}.{test}")
+        _last = f"{_last:8.2f} s" if _last is not None else "     new"
+        print(f"{dut_name + '.' + test:40}{_last}  ({reason})")
+    if not tests:
+        print("No tests affected")
+    if args.dry_run or not tests:
+        return 0
+
+    summary = run([(d, t) for d, t, _ in tests], args.jobs, args.timeout, args.seed)
+    for name, result, duration in summary:
+        print(f"{name:40}{result:9}{duration:8.2f} s")
+        # Runtimes of passing tests schedule the next regression
+        if result == "PASS":
+            history[name] = round(duration, 3)
+    with open(HISTORY, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=1, sort_keys=True)
+    return 0 if all(r == "PASS" for _, r, _ in summary) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+import argparse
+import ast
+import fnmatch
+import os
+import signal
+import subprocess
+import sys
+import time
+import BuildCache
+import HdlClock
+
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+EXT = os.path.join(ROOT, "ext")
+
+# Same libraries as the Makefiles, so make & runner share the build cache
+LIBRARIES = [
+    ("libvhdl", [f"{EXT}/libvhdl/common/UtilsP.vhd"]),
+    ("work", [f"{EXT}/libvhdl/syn/*", f"{EXT}/cryptocores/aes/rtl/vhdl/*.vhd"]),
+]
+COMPILE_ARGS = ["--std=08"]
+
+
+class Dut:
+    """Registry entry of a design under test & its testbench"""
+
+    def __init__(self, toplevel, module, directory="tests", generics=None, timeout=300):
+        self.toplevel = toplevel
+        self.module = module
+        self.directory = os.path.join(ROOT, directory)
+        self.generics = generics or {}
+        # Default wall clock timeout per test in seconds
+        self.timeout = timeout
+
+    @property
+    def tests(self):
+        """Names of the cocotb & pyuvm tests in the testbench module"""
+        with open(os.path.join(self.directory, f"{self.module}.py"), encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        _tests = []
+        for node in tree.body:
+            if isinstance(node, (ast.AsyncFunctionDef, ast.FunctionDef, ast.ClassDef)):
+                for dec in node.decorator_list:
+                    func = dec.func if isinstance(dec, ast.Call) else dec
+                    if isinstance(func, ast.Attribute) and func.attr == "test":
+                        _tests.append(node.name)
+        return _tests
+
+
+DUTS = {
+    "uarttx":    Dut("uarttx", "tb_uarttx"),
+    "uartrx":    Dut("uartrx", "tb_uartrx"),
+    "wishbone":  Dut("wishboneslavee", "tb_wishbone",
+                     generics={"Simulation": "true", "AddressWidth": 8, "DataWidth": 16}),
+    "aes":       Dut("aes", "tb_aes"),
+    "pyuvm_aes": Dut("aes", "tb_aes", directory="pyuvm_tests"),
+}
+
+
+def _get_runner(runner):
+    """cocotb GHDL runner, which runs its commands with runner._execute()"""
+    try:
+        from cocotb_tools.runner import Ghdl
+    except ImportError:
+        from cocotb.runner import Ghdl
+
+    class _Ghdl(Ghdl):
+        def _execute(self, cmds, cwd):
+            runner._execute(cmds, cwd)
+
+    return _Ghdl()
+
+
+def _libraries(hdl_clock=False):
+    _libs = [(library, BuildCache.expand(sources)) for library, sources in LIBRARIES]
+    if not hdl_clock:
+        return _libs
+    # Wrapper top levels with HDL clock of all DUTs in work
+    _work = dict(_libs)["work"]
+    _wrappers = [HdlClock.generate(_work, top, os.path.join(ROOT, "build", "hdlclk"))
+                 for top in sorted({dut.toplevel for dut in DUTS.values()})]
+    return [(lib, sources + _wrappers if lib == "work" else sources) for lib, sources in _libs]
+
+
+class Runner:
+    """Builds each DUT once & runs selected tests with per-test timeouts"""
+
+    def __init__(self, timeout=None, seed=None, waves=False, hdl_clock=False, prebuilt=False):
+        self._runner = _get_runner(self)
+        self._timeout = timeout
+        self._seed = seed
+        # Unique report names per run, like RUN_ID in the Makefiles
+        _run_id = os.environ.get("RUN_ID", time.strftime("%Y%m%d-%H%M%S") if seed is None else str(seed))
+        self._run_id = f"_{_run_id}" if _run_id else ""
+        self._waves = waves
+        self._hdl_clock = hdl_clock
+        self._libraries = _libraries(hdl_clock)
+        self._build_dir = BuildCache.cache_path(self._libraries, COMPILE_ARGS)
+        self._built = set()
+        # DUTs are already built by another process, only simulate
+        self._prebuilt = prebuilt
+        self._limit = None
+        # Set over the runner's environment, which takes all of os.environ
+        self._env = {}
+
+    def _execute(self, cmds, cwd):
+        """Run simulator commands, killing the process group on timeout"""
+        _env = dict(self._runner.env, **self._env)
+        for cmd in cmds:
+            process = subprocess.Popen(cmd, cwd=cwd, env=_env, start_new_session=True)
+            try:
+                returncode = process.wait(timeout=self._limit)
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+                raise TimeoutError(f"{cmd[0]} killed after {self._limit} s") from None
+            if returncode != 0:
+                raise SystemExit(f"Process {cmd[0]!r} terminated with error {returncode}")
+
+    def _toplevel(self, dut):
+        return f"{dut.toplevel}{HdlClock.SUFFIX}" if self._hdl_clock else dut.toplevel
+
+    def build(self, dut):
+        _toplevel = self._toplevel(dut)
+        if self._prebuilt:
+            # Set what the runner's build() sets & its test() checks
+            self._runner.hdl_toplevel = _toplevel
+            self._runner.vhdl_sources = dict(self._libraries)["work"]
+            self._runner.verilog_sources = []
+            return
+        if _toplevel not in self._built:
+            self._limit = None
+            _args = COMPILE_ARGS + [f"--workdir={self._build_dir}", f"-P{self._build_dir}"]
+            # make & other runners may analyse into the same cache directory
+            with BuildCache.locked(self._build_dir):
+                for library, sources in self._libraries:
+                    self._runner.build(hdl_library=library, vhdl_sources=sources,
+                                       build_args=_args, build_dir=self._build_dir,
+                                       hdl_toplevel=_toplevel if library == "work" else None)
+            self._built.add(_toplevel)
+        self._link(dut)
+
+    def _link(self, dut):
+        """Link the executable of GHDL's LLVM & GCC backends into the test directory
+
+        It lives in the build cache. Linked when building, so parallel
+        prebuilt runs don't race on it.
+        """
+        _toplevel = self._toplevel(dut)
+        _exe = os.path.join(self._build_dir, _toplevel)
+        _link = os.path.join(dut.directory, _toplevel)
+        if os.path.isfile(_exe) and os.path.realpath(_link) != os.path.realpath(_exe):
+            if os.path.lexists(_link):
+                os.remove(_link)
+            os.symlink(_exe, _link)
+
+    def test(self, dut, name):
+        """Run one test, returns PASS, FAIL or TIMEOUT"""
+        self.build(dut)
+        results = os.path.join(dut.directory, "results")
+        os.makedirs(results, exist_ok=True)
+        _toplevel = self._toplevel(dut)
+        _prefix = f"{results}/{dut.module}_{name}"
+        _args = [f"--workdir={self._build_dir}", f"-P{self._build_dir}",
+                 f"--psl-report={_prefix}_psl{self._run_id}.json"]
+        if self._waves:
+            _args.append(f"--wave={_prefix}.ghw")
+        # Testbench module first, then the shared BFM modules
+        _path = sys.path[:]
+        sys.path[:0] = [dut.directory, os.path.join(ROOT, "tests")]
+        self._limit = self._timeout or dut.timeout
+        # The runner's test() lets os.environ override extra_env, so an
+        # exported HDL_CLOCK or RUN_ID would win over the options
+        self._env = {"HDL_CLOCK": "1" if self._hdl_clock else "0",
+                     "RUN_ID": self._run_id[1:]}
+        try:
+            xml = self._runner.test(
+                test_module=dut.module, hdl_toplevel=_toplevel,
+                hdl_toplevel_library="work", hdl_toplevel_lang="vhdl",
+                testcase=name, seed=self._seed,
+                test_args=_args, parameters=dut.generics,
+                extra_env={"COCOTB_LOG_LEVEL": "DEBUG", **self._env},
+                build_dir=self._build_dir, test_dir=dut.directory,
+                results_xml=f"{_prefix}.xml")
+        except TimeoutError:
+            return "TIMEOUT"
+        except SystemExit:
+            return "FAIL"
+        finally:
+            sys.path[:] = _path
+        try:
+            from cocotb_tools.runner import get_results
+        except ImportError:
+            from cocotb.runner import get_results
+        try:
+            _, fails = get_results(xml)
+        except SystemExit:
+            # No results file, the simulator crashed
+            return "FAIL"
+        return "FAIL" if fails else "PASS"
+
+
+def select(patterns):
+    """Return (dut name, test) pairs matching any of the patterns
+
+    Patterns are matched against <dut>.<test> and the plain test name.
+    """
+    _selected = []
+    for dut_name, dut in DUTS.items():
+        for test in dut.tests:
+            if not patterns or any(fnmatch.fnmatch(f"{dut_name}.{test}", p)
+                                   or fnmatch.fnmatch(test, p) for p in patterns):
+                _selected.append((dut_name, test))
+    return _selected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build DUTs & run their tests")
+    parser.add_argument("patterns", nargs="*",
+        help="tests to run as <dut>.<test> or <test>, wildcards allowed, default all")
+    parser.add_argument("-l", "--list", action="store_true", help="list tests only")
+    parser.add_argument("-t", "--timeout", type=float,
+        help="wall clock timeout per test in seconds")
+    parser.add_argument("-s", "--seed", type=int, help="random seed")
+    parser.add_argument("-w", "--waves", action="store_true", help="dump GHW waveforms")
+    parser.add_argument("--hdl-clock", action="store_true",
+        help="generate clocks in HDL wrapper top levels instead of cocotb")
+    parser.add_argument("--prebuilt", action="store_true",
+        help="don't build, the DUTs are built already (parallel runs)")
+    args = parser.parse_args()
+
+    selected = select(args.patterns)
+    if args.list:
+        for dut_name, test in selected:
+            print(f"{dut_name}.{test}")
+        return 0
+
+    runner = Runner(args.timeout, args.seed, args.waves, args.hdl_clock, args.prebuilt)
+    summary = []
+    for dut_name, test in selected:
+        start = time.perf_counter()
+        result = runner.test(DUTS[dut_name], test)
+        summary.append((f"{dut_name}.{test}", result, time.perf_counter() - start))
+
+    for name, result, duration in summary:
+        print(f"{name:40}{result:9}{duration:8.2f} s")
+    return 0 if all(r == "PASS" for _, r, _ in summary) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+import json
+import logging
+import os
+import random
+import cocotb
+from cocotb.utils import get_sim_time
+
+
+# Randomized iterations per simulation, set with SEEDS=K
+COUNT = int(os.environ.get("SEEDS", "1"))
+
+log = logging.getLogger("cocotb.seeds")
+
+
+def seeds(base=None):
+    """Seeds of the iterations, the first one is cocotb's RANDOM_SEED"""
+    base = cocotb.RANDOM_SEED if base is None else base
+    return [base + i for i in range(COUNT)]
+
+
+def reseed(seed, *randobjs):
+    """Seed random & the given pyvsc random objects
+
+    pyvsc random objects created later take their seed from random.
+    """
+    random.seed(seed)
+    if randobjs:
+        import vsc
+        for obj in randobjs:
+            obj.set_randstate(vsc.RandState.mkFromSeed(seed))
+
+
+async def run_seeds(name, iteration, reset=None, randobjs=()):
+    """Run iteration(seed) once per seed, return the transactions done
+
+    iteration returns its number of transactions, reset() resets DUT &
+    per-iteration state before all but the first iteration. A failing
+    iteration is recorded and the others still run, the results per
+    seed are written to results/<name>_seeds.json.
+    """
+    _results = []
+    _done = 0
+    for i, seed in enumerate(seeds()):
+        reseed(seed, *randobjs)
+        if i and reset:
+            await reset()
+        _start = get_sim_time("ns")
+        _result = {"seed": seed}
+        try:
+            _count = await iteration(seed)
+            _done += _count
+            _result.update(result="PASS", transactions=_count)
+        except AssertionError as e:
+            log.error(f"{name} seed {seed} failed: {e}")
+            _result.update(result="FAIL", error=str(e))
+        _result["sim_ns"] = get_sim_time("ns") - _start
+        _results.append(_result)
+
+    os.makedirs("results", exist_ok=True)
+    with open(f"results/{name}_seeds.json", "w", encoding="utf-8") as f:
+        json.dump(_results, f, indent=2)
+    _failed = [r["seed"] for r in _results if r["result"] == "FAIL"]
+    if COUNT > 1:
+        log.info(f"{name}: {COUNT - len(_failed)} of {COUNT} seeds passed")
+    assert not _failed, f"{name} failed with seeds {_failed}, see results/{name}_seeds.json"
+    return _done
@@ -2,6 +2,7 @@ import logging
 import cocotb
 from cocotb.utils import get_sim_time
 from cocotb.triggers import FallingEdge, RisingEdge, Timer
+from Profiler import profiled
 
 
 class Sram:
@@ -20,6 +21,13 @@ class Sram:
         self._mem = mem
 
         self._clkedge = RisingEdge(self._clk)
+        self._active = None
+
+    def stop(self):
+        """Kill the background coroutine, _restart() starts it again"""
+        if self._active is not None:
+            self._active.kill()
+            self._active = None
 
 
 class SramRead(Sram):
@@ -36,19 +44,21 @@ class SramRead(Sram):
 
     def _restart(self):
         self.log.debug("SramRead._restart()")
-        if self._active is not None:
-            self._active.kill()
+        self.stop()
         # Schedule SRAM read to run concurrently
         self._active = cocotb.start_soon(self._read())
 
+    @profiled
     async def _read(self):
         self.log.debug("SramRead._read()")
+        # Cached handles, looked up once instead of per cycle
+        clkedge, ren, adr, din, mem = self._clkedge, self._ren, self._adr, self._din, self._mem
         while True:
-            await self._clkedge
-            if self._ren.value == 1:
-                _data = self._mem[str(self._adr.value)]
-                self._din.value = _data
-                self.log.info(f"Read data:  {hex(_data)} from adr: {hex(self._adr.value)}")
+            await clkedge
+            if ren.value == 1:
+                _data = mem[str(adr.value)]
+                din.value = _data
+                self.log.info(f"Read data:  {hex(_data)} from adr: {hex(adr.value)}")
 
 
 class SramWrite(Sram):
@@ -65,23 +75,24 @@ class SramWrite(Sram):
 
     def _restart(self):
         self.log.debug("SramWrite._restart()")
-        if self._active is not None:
-            self._active.kill()
+        self.stop()
         # Schedule SRAM write to run concurrently
         self._active = cocotb.start_soon(self._write())
 
+    @profiled
     async def _write(self):
         self.log.debug("SramWrite._write()")
+        clkedge, wen, adr, dout, mem = self._clkedge, self._wen, self._adr, self._dout, self._mem
         while True:
-            await self._clkedge
-            if self._wen.value == 1:
-                self._mem[str(self._adr.value)] = self._dout.value
-                self.log.info(f"Wrote data: {hex(self._dout.value)} to adr:   {hex(self._adr.value)}")
+            await clkedge
+            if wen.value == 1:
+                mem[str(adr.value)] = dout.value
+                self.log.info(f"Wrote data: {hex(dout.value)} to adr:   {hex(adr.value)}")
 
 
 class SramMonitor(Sram):
 
-    def __init__(self, clk, wen, ren, adr, din, dout, *args, **kwargs):
+    def __init__(self, clk, wen, ren, adr, din, dout, callback=None, record=True, *args, **kwargs):
         super().__init__(clk, wen, ren, adr, din, dout, None, *args, **kwargs)
     
         self.log.info("SRAM monitor")
@@ -90,31 +101,48 @@ class SramMonitor(Sram):
     
         self._active = None
         self._transactions = {}
+        # Called with every transaction, record=False keeps no transaction log
+        self._callback = callback
+        self._record = record
         self._restart()
 
     def _restart(self):
         self.log.debug("SramMonitor._restart()")
-        if self._active is not None:
-            self._active.kill()
+        self.stop()
         # Schedule SRAM read to run concurrently
         self._active = cocotb.start_soon(self._read())
 
+    @profiled
     async def _read(self):
         self.log.debug("SramMonitor._read()")
+        clkedge, wen, ren = self._clkedge, self._wen, self._ren
+        adr, din, dout = self._adr, self._din, self._dout
+        # Read of the former clock edge, its data is valid one edge later
+        _read = None
         while True:
-            await self._clkedge
-            if self._wen.value:
-                self._transactions[str(get_sim_time('ns'))] = {
-                    "type" : "write",
-                    "adr"  : self._adr.value,
-                    "data" : self._dout.value}
-            elif self._ren.value:
-                _adr = self._adr.value
-                await self._clkedge
-                self._transactions[str(get_sim_time('ns'))] = {
+            await clkedge
+            if _read is not None:
+                _time, _adr = _read
+                _read = None
+                self._add(_time, {
                     "type" : "read",
                     "adr"  : _adr,
-                    "data" : self._din.value}
+                    "data" : din.value})
+            # Sampled on every edge, also the one completing a read
+            if wen.value:
+                self._add(get_sim_time('ns'), {
+                    "type" : "write",
+                    "adr"  : adr.value,
+                    "data" : dout.value})
+            elif ren.value:
+                _read = (get_sim_time('ns'), adr.value)
+
+    def _add(self, time, tr):
+        """Record a transaction by the time it was issued"""
+        if self._record:
+            self._transactions[str(time)] = tr
+        if self._callback:
+            self._callback(tr)
 
     @property
     def transactions(self, index=None):
@@ -0,0 +1,86 @@
+import importlib
+import logging
+import os
+import sys
+import time
+import types
+
+
+# Write startup time reports with STARTUP_REPORT=1
+ENABLED = os.environ.get("STARTUP_REPORT") == "1"
+
+
+def _process_age():
+    """Seconds since the (simulator) process started, None if unknown"""
+    try:
+        with open("/proc/self/stat", encoding="utf-8") as f:
+            _start = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", encoding="utf-8") as f:
+            _uptime = float(f.read().split()[0])
+        return _uptime - _start / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Startup:
+    """Startup time of a testbench
+
+    Time from process start to the import of this module (simulator,
+    interpreter & cocotb), named marks relative to it & the load times
+    of lazily imported modules.
+    """
+
+    def __init__(self):
+        self._t0 = time.perf_counter()
+        self._age = _process_age()
+        self._marks = []
+        self._imports = []
+        self.log = logging.getLogger("cocotb.startup")
+
+    def mark(self, name):
+        self._marks.append((name, time.perf_counter() - self._t0))
+
+    def timed_import(self, name):
+        _start = time.perf_counter()
+        _module = importlib.import_module(name)
+        self._imports.append((name, time.perf_counter() - _start))
+        return _module
+
+    def report(self):
+        _lines = []
+        if self._age is not None:
+            _lines.append(f"{'process start':40}{-self._age:10.3f} s")
+        _lines.append(f"{'startup module import':40}{0:10.3f} s")
+        for name, t in self._marks:
+            _lines.append(f"{name:40}{t:10.3f} s")
+        for name, t in self._imports:
+            _lines.append(f"{'lazy import ' + name:40}{t:10.3f} s")
+        return "\n".join(_lines)
+
+    def write_report(self, name):
+        """Write results/<name>_startup.txt, no-op unless enabled"""
+        if not ENABLED:
+            return
+        self.mark(f"{name} report")
+        _report = self.report()
+        self.log.info(f"Startup times:\n{_report}")
+        os.makedirs("results", exist_ok=True)
+        with open(f"results/{name}_startup.txt", "w", encoding="utf-8") as f:
+            f.write(_report + "\n")
+
+
+startup = Startup()
+
+
+class _LazyModule(types.ModuleType):
+
+    def __getattr__(self, attr):
+        _module = startup.timed_import(self.__name__)
+        # Later lookups are served from the proxy's dict directly
+        self.__dict__.update(vars(_module))
+        return getattr(_module, attr)
+
+
+def lazy_import(name):
+    """Module proxy, which imports the module on first attribute access"""
+    return sys.modules.get(name) or _LazyModule(name)
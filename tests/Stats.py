@@ -0,0 +1,67 @@
+import math
+
+
+class Histogram:
+    """Streaming log-linear histogram of non-negative integers
+
+    Values below 2 * sub_buckets are counted exactly, larger ones in
+    sub_buckets buckets per power of two. So the relative error of the
+    percentiles is below 1 / sub_buckets and the memory use doesn't
+    depend on the number of samples.
+    """
+
+    def __init__(self, name, sub_buckets=16):
+        self.name = name
+        self._bits = int(math.log2(sub_buckets))
+        self._sub = 1 << self._bits
+        self._buckets = []
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        if value < 2 * self._sub:
+            return value
+        shift = value.bit_length() - self._bits - 1
+        return (shift + 1) * self._sub + (value >> shift) - self._sub
+
+    def _upper(self, index):
+        if index < 2 * self._sub:
+            return index
+        shift = index // self._sub - 1
+        return ((index % self._sub + self._sub + 1) << shift) - 1
+
+    def add(self, value):
+        value = round(value)
+        index = self._index(value)
+        if index >= len(self._buckets):
+            self._buckets.extend([0] * (index + 1 - len(self._buckets)))
+        self._buckets[index] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(p / 100 * self.count))
+        for index, hits in enumerate(self._buckets):
+            rank -= hits
+            if rank <= 0:
+                return min(max(self._upper(index), self.min), self.max)
+
+    def __str__(self):
+        if not self.count:
+            return f"{self.name:24}no samples"
+        return (f"{self.name:24}n={self.count:<8} min={self.min:<6} mean={self.mean:<8.1f} "
+                f"p50={self.percentile(50):<6} p90={self.percentile(90):<6} "
+                f"p99={self.percentile(99):<6} max={self.max}")
@@ -0,0 +1,192 @@
+import logging
+import os
+from collections import namedtuple
+from cocotb.queue import Queue
+from cocotb.triggers import Timer
+from cocotb.utils import get_sim_time
+from Profiler import profiled
+from Startup import lazy_import
+from Uart import Uart
+from Watchdog import progress
+
+
+# Loaded by the AES model only
+AES = lazy_import("Crypto.Cipher.AES")
+
+# Transaction level models instead of RTL & BFMs, set with TLM=1
+ENABLED = os.environ.get("TLM") == "1"
+
+
+# Result of a Wishbone operation, fields as used from WBRes
+WishboneResult = namedtuple("WishboneResult", "adr datrd datwr")
+
+
+class TlmModel:
+    """TLM base class
+
+    Models a DUT together with its BFMs on transaction level. Latencies
+    are given in clock cycles and modelled with timers, no signals are
+    accessed. The model handles one operation at a time, send() blocks
+    until it is accepted & receive() returns results when they are due.
+    """
+
+    def __init__(self, name, period_ns=10, *args, **kwargs):
+        self._version = "0.0.1"
+
+        self.log = logging.getLogger(f"cocotb.tlm.{name}")
+
+        self.period_ns = period_ns
+        self._queue = Queue()
+        # Sim time the model is free for the next operation
+        self._free = 0
+
+    async def _delay(self, cycles):
+        if cycles:
+            await Timer(cycles * self.period_ns, units="ns")
+
+    async def _until(self, time_ns):
+        _now = round(get_sim_time("ns"))
+        if time_ns > _now:
+            await Timer(time_ns - _now, units="ns")
+
+    async def _issue(self, result, cycles):
+        """Accept an operation once free, its result is due after cycles"""
+        await self._until(self._free)
+        # Accept cycle
+        await self._delay(1)
+        self._free = round(get_sim_time("ns")) + cycles * self.period_ns
+        self._queue.put_nowait((self._free, result))
+
+    def state(self):
+        return f"{self._queue.qsize()} results pending, free at {self._free} ns"
+
+    async def receive(self):
+        _due, _result = await self._queue.get()
+        await self._until(_due)
+        progress()
+        return _result
+
+
+class AesTlm(TlmModel):
+    """AES core model
+
+    send() takes mode, key & data as integers or bytes, receive() returns
+    the result as bytes like VaiReceiver with fmt="bytes".
+    """
+
+    def __init__(self, latency=12, period_ns=10, name="aes", *args, **kwargs):
+        super().__init__(name, period_ns, *args, **kwargs)
+
+        self.log.info("AES transaction level model")
+        self.log.info("  cocotbext-tlm version %s", self._version)
+        self.log.info("  Copyright (c) 2022 Torsten Meissner")
+
+        self._latency = latency
+
+    @staticmethod
+    def _bytes(value):
+        return value if isinstance(value, bytes) else value.to_bytes(16, "big")
+
+    @profiled(transaction=True)
+    async def send(self, data):
+        mode, key, data = data
+        _aes = AES.new(self._bytes(key), AES.MODE_ECB)
+        _data = self._bytes(data)
+        _result = _aes.decrypt(_data) if mode else _aes.encrypt(_data)
+        await self._issue(_result, self._latency)
+
+
+class UartTlm(TlmModel):
+    """UART model of a VAI to UART (or UART to VAI) path
+
+    Data sent is encoded into a UART frame (bits in line order), which
+    is due after its transmission time. Receive the data with a
+    UartTlmReceiver on the other end of the path.
+    """
+
+    def __init__(self, div, bits, parity, period_ns=10, name="uart", *args, **kwargs):
+        super().__init__(name, period_ns, *args, **kwargs)
+
+        self.log.info("UART transaction level model")
+        self.log.info("  cocotbext-tlm version %s", self._version)
+        self.log.info("  Copyright (c) 2022 Torsten Meissner")
+
+        self.bits = bits
+        self.parity = parity
+        # Start, data, parity & stop bits
+        self._frame = div * (bits + 2 + int(bool(parity)))
+
+    @profiled(transaction=True)
+    async def send(self, data):
+        _frame = [0] + [(data >> x) & 1 for x in range(self.bits)]
+        if self.parity:
+            _frame.append(Uart.odd_parity(data & (2**self.bits - 1)))
+        _frame.append(1)
+        await self._issue(_frame, self._frame)
+
+
+class UartTlmReceiver:
+    """Receiving end of a UartTlm path
+
+    Decodes the frames of the model & checks start, parity & stop bits
+    like UartReceiver, so tests check the data on the modelled line.
+    """
+
+    def __init__(self, model):
+        self.log = model.log
+        self._model = model
+
+    def state(self):
+        return self._model.state()
+
+    async def receive(self):
+        """Receive and return one UART frame"""
+        _frame = await self._model.receive()
+        _bits = self._model.bits
+        if _frame[0] != 0:
+            self.log.warning("Start bit set")
+        _rec = sum(bit << x for x, bit in enumerate(_frame[1:_bits + 1]))
+        if self._model.parity and Uart.odd_parity(_rec) != _frame[_bits + 1]:
+            self.log.warning("Parity wrong")
+        if _frame[-1] != 1:
+            self.log.warning("Stop bit not set")
+        return _rec
+
+
+class WishboneTlm(TlmModel):
+    """Wishbone slave & SRAM model
+
+    Replaces WishboneMaster with the DUT & SRAM models, each operation
+    of a bus cycle takes latency clock cycles.
+    """
+
+    # No clock signal, idle cycles are modelled with timers
+    clock = None
+
+    def __init__(self, adr_width, dat_width, latency=2, period_ns=10, name="wishbone",
+                 *args, **kwargs):
+        super().__init__(name, period_ns, *args, **kwargs)
+
+        self.log.info("Wishbone transaction level model")
+        self.log.info("  cocotbext-tlm version %s", self._version)
+        self.log.info("  Copyright (c) 2022 Torsten Meissner")
+
+        self._adr_mask = 2**adr_width - 1
+        self._dat_mask = 2**dat_width - 1
+        self._latency = latency
+        self._mem = {}
+        self._clk_cycle_count = 0
+
+    @profiled(transaction=True)
+    async def send_cycle(self, ops):
+        _res = []
+        for op in ops:
+            _adr = op.adr & self._adr_mask
+            if op.dat is None:
+                _res.append(WishboneResult(_adr, self._mem.get(_adr, 0), None))
+            else:
+                self._mem[_adr] = op.dat & self._dat_mask
+                _res.append(WishboneResult(_adr, None, op.dat))
+        self._clk_cycle_count = len(ops) * self._latency
+        await self._delay(self._clk_cycle_count)
+        return _res
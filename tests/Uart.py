@@ -1,11 +1,17 @@
 import logging
-from cocotb.triggers import FallingEdge, RisingEdge, Timer
+from cocotb.triggers import ClockCycles, FallingEdge, First, RisingEdge, Timer
+from Profiler import profiled
+from Watchdog import BfmTimeoutError, TIMEOUT, progress
 
 
 class Uart:
-    """UART base class"""
+    """UART base class
 
-    def __init__(self, txrx, clock, div, bits, parity, *args, **kwargs):
+    timeout is the number of clock cycles blocking calls wait for a
+    frame, BFM_TIMEOUT by default, 0 waits forever.
+    """
+
+    def __init__(self, txrx, clock, div, bits, parity, *args, timeout=None, **kwargs):
         self._version = "0.0.1"
 
         self.log = logging.getLogger(f"cocotb.{txrx._path}")
@@ -17,11 +23,15 @@ class Uart:
         self._par = parity
 
         self._clkedge = RisingEdge(self._clock)
+        self._timeout = TIMEOUT if timeout is None else timeout
 
     async def _wait_cycle(self):
         for x in range(self._div):
             await self._clkedge
 
+    def state(self):
+        return f"{self._txrx._name}={self._txrx.value}"
+
     @staticmethod
     def odd_parity(data):
         parity = True
@@ -40,11 +50,19 @@ class UartReceiver(Uart):
         self.log.info("  cocotbext-uart version %s", self._version)
         self.log.info("  Copyright (c) 2022 Torsten Meissner")
 
-    async def receive(self):
+    @profiled(transaction=True)
+    async def receive(self, timeout=None):
         """Receive and return one UART frame"""
 
         # Wait for frame start
-        await FallingEdge(self._txrx)
+        _timeout = self._timeout if timeout is None else timeout
+        if _timeout:
+            _start = FallingEdge(self._txrx)
+            if await First(_start, ClockCycles(self._clock, _timeout)) is not _start:
+                raise BfmTimeoutError(f"No frame start on {self._txrx._path} within "
+                                      f"{_timeout} cycles, {self.state()}")
+        else:
+            await FallingEdge(self._txrx)
 
         # Consume start bit
         await self._get_start_bit()
@@ -63,6 +81,7 @@ class UartReceiver(Uart):
         await self._get_stop_bit()
 
         self.log.info("Received data: %s", hex(self._rec))
+        progress()
         return self._rec
 
     async def _get_start_bit(self):
@@ -97,6 +116,7 @@ class UartDriver(Uart):
         # Drive input defaults (setimmediatevalue to avoid x asserts)
         self._txrx.setimmediatevalue(1)
 
+    @profiled(transaction=True)
     async def send(self, data):
         """Send one UART frame"""
 
@@ -119,6 +139,7 @@ class UartDriver(Uart):
 
         # Consume stop bit
         await self._send_bit(1)
+        progress()
 
     async def _send_bit(self, data):
         self._txrx.value = data
@@ -1,13 +1,133 @@
 import logging
 import cocotb
+from collections import deque
 from cocotb.utils import get_sim_time
 from cocotb.triggers import FallingEdge, RisingEdge, Timer
+from Profiler import profiled
+from Stats import Histogram
+from Watchdog import BfmTimeoutError, TIMEOUT, progress
+
+
+class VaiBus:
+    """Data signals of a valid-accept interface
+
+    Fields & their widths are declared once and the signal handles are
+    resolved at construction. A transaction is written from or read as
+    one integer with the first field in the most significant bits, or
+    as a sequence of field values. Writes are scheduled by cocotb and
+    applied together in one batch per clock edge.
+
+    Fields are sampled once per read in their canonical form: int, bytes
+    (big endian) or raw (BinaryValue). It is set per bus with fmt or per
+    field as third entry of its declaration.
+    """
+
+    formats = ("int", "bytes", "raw")
+
+    def __init__(self, entity, fields, prefix="", fmt="int"):
+        _names = []
+        _handles = []
+        _fmts = []
+        for field in fields:
+            if isinstance(field, tuple):
+                name, width, _fmt = (field + (None,))[:3]
+            else:
+                name, width, _fmt = field, None, None
+            try:
+                handle = getattr(entity, f"{prefix}{name}")
+            except AttributeError:
+                raise AttributeError(
+                    f"VAI bus field {prefix}{name} not found in {entity._path}") from None
+            if width is not None and width != len(handle):
+                raise ValueError(
+                    f"VAI bus field {prefix}{name} is {len(handle)} bits wide, declared {width}")
+            _names.append(name)
+            _handles.append(handle)
+            _fmts.append(_fmt or fmt)
+        self._setup(_names, _handles, _fmts)
+
+    def _setup(self, fields, handles, fmts):
+        for _fmt in fmts:
+            if _fmt not in self.formats:
+                raise ValueError(f"Unknown VAI bus format {_fmt}, valid are {self.formats}")
+        self.fields = fields
+        self.handles = handles
+        self.fmts = fmts
+        self.widths = [len(h) for h in handles]
+        self.width = sum(self.widths)
+        self._shifts = [sum(self.widths[i + 1:]) for i in range(len(self.widths))]
+        self._masks = [2**w - 1 for w in self.widths]
+        self._readers = [self._reader(f, w) for f, w in zip(fmts, self.widths)]
+
+    @staticmethod
+    def _reader(fmt, width):
+        if fmt == "int":
+            return lambda value: value.integer
+        if fmt == "bytes":
+            # BinaryValue.buff converts bit by bit, going via the integer is faster
+            _bytes = (width + 7) // 8
+            return lambda value: value.integer.to_bytes(_bytes, "big")
+        return lambda value: value
+
+    @classmethod
+    def of(cls, data, fmt="int"):
+        """Bus of a VaiBus, a signal handle or a list of signal handles"""
+        if isinstance(data, cls):
+            return data
+        _handles = list(data) if isinstance(data, list) else [data]
+        _bus = cls.__new__(cls)
+        _bus._setup([h._name for h in _handles], _handles, [fmt] * len(_handles))
+        return _bus
+
+    def __len__(self):
+        return self.width
+
+    def pack(self, values):
+        _packed = 0
+        for value, shift, mask in zip(values, self._shifts, self._masks):
+            _packed |= (int(value) & mask) << shift
+        return _packed
+
+    def unpack(self, packed):
+        return tuple((packed >> shift) & mask for shift, mask in zip(self._shifts, self._masks))
+
+    def write(self, data):
+        """Write a packed integer or a sequence of field values
+
+        Returns the field values written.
+        """
+        _values = self.unpack(data) if isinstance(data, int) else data
+        for handle, value in zip(self.handles, _values):
+            handle.value = value
+        return _values
+
+    def setimmediatevalue(self, value):
+        for handle, value in zip(self.handles, self.unpack(value)):
+            handle.setimmediatevalue(value)
+
+    def read(self):
+        """Current field values in their canonical form"""
+        return tuple(read(handle.value) for read, handle in zip(self._readers, self.handles))
+
+    def read_packed(self):
+        return self.pack(handle.value.integer for handle in self.handles)
+
+    def read_bytes(self):
+        return self.read_packed().to_bytes((self.width + 7) // 8, "big")
+
+    @staticmethod
+    def hex(value):
+        return value.hex() if isinstance(value, bytes) else hex(value)
 
 
 class Vai:
-    """VAI base class"""
+    """VAI base class
 
-    def __init__(self, clock, data, valid, accept, *args, **kwargs):
+    timeout is the number of clock cycles blocking calls wait for the
+    handshake, BFM_TIMEOUT by default, 0 waits forever.
+    """
+
+    def __init__(self, clock, data, valid, accept, *args, timeout=None, **kwargs):
         self._version = "0.0.1"
 
         self.log = logging.getLogger(f"cocotb.{valid._path}")
@@ -18,6 +138,20 @@ class Vai:
         self._clock = clock
 
         self._clkedge = RisingEdge(self._clock)
+        self._timeout = TIMEOUT if timeout is None else timeout
+
+    async def _wait(self, signal, timeout):
+        """Wait until signal is set, at most timeout cycles"""
+        _cycles = 0
+        while not signal.value:
+            if timeout and _cycles == timeout:
+                raise BfmTimeoutError(f"{signal._path} not set within {timeout} cycles, "
+                                      f"{self.state()}")
+            await self._clkedge
+            _cycles += 1
+
+    def state(self):
+        return f"valid={self._valid.value} accept={self._accept.value}"
 
 
 class VaiDriver(Vai):
@@ -30,78 +164,76 @@ class VaiDriver(Vai):
         self.log.info("  cocotbext-vai version %s", self._version)
         self.log.info("  Copyright (c) 2022 Torsten Meissner")
 
-        # Hack to drive lists of signals
-        if isinstance(self._data, list):
-            for entry in self._data:
-                entry.setimmediatevalue(0)
-        else:
-            self._data.setimmediatevalue(0)
+        # Single signals & lists of signals are driven as bus
+        self._bus = VaiBus.of(self._data)
+        self._bus.setimmediatevalue(0)
         self._valid.setimmediatevalue(0)
 
-    async def send(self, data, sync=True):
+    @profiled(transaction=True)
+    async def send(self, data, sync=True, timeout=None):
         if sync:
             await self._clkedge
 
         self._valid.value = 1
+        _values = self._bus.write(data)
 
-        if isinstance(self._data, list):
-            _info = ', '.join(map(lambda x: str(hex(x)), data))
-            for i in range(len(self._data)):
-                self._data[i].value = data[i]
-
-        else:
-            self._data.value = data
-            _info = hex(data)
+        self.log.info(f"Send data:    {', '.join(map(hex, _values))}")
 
-        self.log.info(f"Send data:    {_info}")
-
-        while True:
-            if self._accept.value:
-                break
-            await self._clkedge
+        await self._wait(self._accept, self._timeout if timeout is None else timeout)
         await self._clkedge
 
         self._valid.value = 0
+        progress()
 
 
 
 class VaiReceiver(Vai):
-    """Valid-Accept Receiver"""
+    """Valid-Accept Receiver
 
-    def __init__(self, clock, data, valid, accept, *args, **kwargs):
+    Received data is returned in the form given by fmt (see VaiBus),
+    a tuple for multiple data signals.
+    """
+
+    def __init__(self, clock, data, valid, accept, fmt="raw", *args, **kwargs):
         super().__init__(clock, data, valid, accept, *args, **kwargs)
 
         self.log.info("Valid-accept receiver")
         self.log.info("  cocotbext-vai version %s", self._version)
         self.log.info("  Copyright (c) 2022 Torsten Meissner")
 
+        self._bus = VaiBus.of(self._data, fmt)
+        self._single = len(self._bus.handles) == 1
+
         # Drive input defaults (setimmediatevalue to avoid x asserts)
         self._accept.setimmediatevalue(0)
 
-    async def receive(self, sync=True):
+    @profiled(transaction=True)
+    async def receive(self, sync=True, timeout=None):
         if sync:
             await self._clkedge
 
-        while True:
-            if self._valid.value:
-                break
-            await self._clkedge
-        
+        await self._wait(self._valid, self._timeout if timeout is None else timeout)
+
         await self._clkedge
         self._accept.value = 1
-        _rec = self._data.value
-        self.log.info(f"Receive data: {hex(_rec)}")
+        _rec = self._bus.read()
+        if self._single:
+            _rec = _rec[0]
+            self.log.info(f"Receive data: {self._bus.hex(_rec)}")
+        else:
+            self.log.info(f"Receive data: {', '.join(map(self._bus.hex, _rec))}")
 
         await self._clkedge
         self._accept.value = 0
 
+        progress()
         return _rec
 
 
 class VaiMonitor(Vai):
     """Valid-Accept Receiver"""
 
-    def __init__(self, clock, data, valid, accept, queue=None, *args, **kwargs):
+    def __init__(self, clock, data, valid, accept, queue=None, fmt="int", *args, **kwargs):
         super().__init__(clock, data, valid, accept, *args, **kwargs)
 
         self.log.info("Valid-accept monitor")
@@ -110,22 +242,33 @@ class VaiMonitor(Vai):
 
         self._active = None
         self._queue = queue
+        self._bus = VaiBus.of(self._data, fmt)
         self._transactions = {}
         self._restart()
 
     def _restart(self):
-        self.log.debug("SramMonitor._restart()")
-        if self._active is not None:
-            self._active.kill()
+        self.log.debug("VaiMonitor._restart()")
+        self.stop()
         # Schedule VAI read to run concurrently
         self._active = cocotb.start_soon(self._read())
 
+    def stop(self):
+        """Kill the monitor coroutine, _restart() starts it again"""
+        if self._active is not None:
+            self._active.kill()
+            self._active = None
+
+    @profiled
     async def _read(self, cb=None):
+        # Cached handles, looked up once instead of per cycle
+        clkedge, valid, accept = self._clkedge, self._valid, self._accept
+        queue, read = self._queue, self._bus.read
         while True:
-            await self._clkedge
-            if self._valid.value and self._accept.value:
-                if self._queue:
-                    await self._queue.put(self._data)
+            await clkedge
+            if valid.value and accept.value:
+                if queue:
+                    # Sample field values of the accepted beat
+                    await queue.put(read())
                 #self._transactions[str(get_sim_time('ns'))] = {
                 #    "data" : self._data.value}
 
@@ -137,3 +280,108 @@ class VaiMonitor(Vai):
             return {key: self._transactions[key]}
         else:
             return self._transactions
+
+
+class VaiPerfMonitor:
+    """Valid-Accept performance monitor
+
+    Pairs the input & output side of a DUT and keeps histograms of
+    latency, initiation interval, stall cycles & utilisation.
+    """
+
+    def __init__(self, clock, in_valid, in_accept, out_valid, out_accept, *args, **kwargs):
+        self._version = "0.0.1"
+
+        self.log = logging.getLogger(f"cocotb.{in_valid._path}")
+
+        self.log.info("Valid-accept performance monitor")
+        self.log.info("  cocotbext-vai version %s", self._version)
+        self.log.info("  Copyright (c) 2022 Torsten Meissner")
+
+        self._in_valid = in_valid
+        self._in_accept = in_accept
+        self._out_valid = out_valid
+        self._out_accept = out_accept
+        self._clock = clock
+
+        self._clkedge = RisingEdge(self._clock)
+
+        self._active = None
+        self._restart()
+
+    def _restart(self):
+        self.log.debug("VaiPerfMonitor._restart()")
+        self.stop()
+        self.latency = Histogram("latency")
+        self.in_interval = Histogram("input interval")
+        self.out_interval = Histogram("output interval")
+        self.stalls = Histogram("input stalls")
+        # Input timestamps of beats in flight through the DUT
+        self._pending = deque()
+        self._cycles = 0
+        self._in_beats = 0
+        self._out_beats = 0
+        # Schedule VAI performance monitor to run concurrently
+        self._active = cocotb.start_soon(self._read())
+
+    def stop(self):
+        """Kill the monitor coroutine, _restart() starts it again"""
+        if self._active is not None:
+            self._active.kill()
+            self._active = None
+
+    @profiled
+    async def _read(self):
+        # Clock period to convert timestamps into cycles
+        await self._clkedge
+        start = get_sim_time('ns')
+        await self._clkedge
+        period = get_sim_time('ns') - start
+        last_in = last_out = None
+        stalls = 0
+        clkedge = self._clkedge
+        in_valid, in_accept = self._in_valid, self._in_accept
+        out_valid, out_accept = self._out_valid, self._out_accept
+        while True:
+            await clkedge
+            self._cycles += 1
+            if in_valid.value:
+                if in_accept.value:
+                    now = get_sim_time('ns')
+                    self._pending.append(now)
+                    self._in_beats += 1
+                    if last_in is not None:
+                        self.in_interval.add((now - last_in) / period)
+                    last_in = now
+                    self.stalls.add(stalls)
+                    stalls = 0
+                else:
+                    stalls += 1
+            if out_valid.value and out_accept.value:
+                now = get_sim_time('ns')
+                self._out_beats += 1
+                if self._pending:
+                    self.latency.add((now - self._pending.popleft()) / period)
+                else:
+                    self.log.warning("Output beat without input beat")
+                if last_out is not None:
+                    self.out_interval.add((now - last_out) / period)
+                last_out = now
+
+    @property
+    def utilisation(self):
+        """Input & output side utilisation in beats per cycle"""
+        if not self._cycles:
+            return (0.0, 0.0)
+        return (self._in_beats / self._cycles, self._out_beats / self._cycles)
+
+    def report(self):
+        _util = self.utilisation
+        _report = "\n".join([
+            f"{'cycles':24}{self._cycles}",
+            f"{'input utilisation':24}{100 * _util[0]:.2f} %",
+            f"{'output utilisation':24}{100 * _util[1]:.2f} %",
+            str(self.latency), str(self.in_interval),
+            str(self.out_interval), str(self.stalls)])
+        self.log.info(f"Performance (in cycles):\n{_report}")
+        return _report
@@ -0,0 +1,77 @@
+import logging
+import os
+import cocotb
+from cocotb.result import SimTimeoutError
+from cocotb.triggers import Timer
+
+
+# Clock cycles a blocking BFM call waits, disable with BFM_TIMEOUT=0
+TIMEOUT = int(os.environ.get("BFM_TIMEOUT", "10000"))
+# Sim time without progress until the test is ended, disable with WATCHDOG_NS=0
+WINDOW_NS = int(os.environ.get("WATCHDOG_NS", "1000000"))
+
+# Transactions completed by all BFMs & models
+_done = 0
+
+
+class BfmTimeoutError(SimTimeoutError):
+    """A blocking BFM call didn't complete within its timeout"""
+
+
+def progress(count=1):
+    """Count completed transactions, called by the BFMs"""
+    global _done
+    _done += count
+
+
+class Watchdog:
+    """Forward progress watchdog
+
+    Checks each window_ns of sim time that BFMs completed transactions.
+    On a stall it logs the state of the watched BFMs & queues and ends
+    the test with a SimTimeoutError. Objects with a state() method are
+    dumped with it, queues with their fill level.
+    """
+
+    def __init__(self, name="watchdog", window_ns=WINDOW_NS, **watched):
+        self.log = logging.getLogger(f"cocotb.{name}")
+        self._window = window_ns
+        self._watched = watched
+        self._active = None
+
+    def watch(self, **watched):
+        self._watched.update(watched)
+        return self
+
+    def start(self):
+        self.stop()
+        if self._window:
+            self._active = cocotb.start_soon(self._run())
+        return self
+
+    def stop(self):
+        if self._active is not None:
+            self._active.kill()
+            self._active = None
+
+    def state(self):
+        _lines = []
+        for name, obj in self._watched.items():
+            if hasattr(obj, "state"):
+                _state = obj.state()
+            elif hasattr(obj, "qsize"):
+                _state = f"{obj.qsize()} queued"
+            else:
+                _state = repr(obj)
+            _lines.append(f"  {name}: {_state}")
+        return "\n".join(_lines)
+
+    async def _run(self):
+        _last = _done
+        while True:
+            await Timer(self._window, units="ns")
+            if _done == _last:
+                self.log.error(f"No progress for {self._window} ns, {_done} transactions "
+                               f"done, state:\n{self.state()}")
+                raise SimTimeoutError(f"No progress for {self._window} ns")
+            _last = _done
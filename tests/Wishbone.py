@@ -0,0 +1,216 @@
+import logging
+import random
+from collections import deque
+from cocotb.utils import get_sim_time
+from cocotb.triggers import ClockCycles, Timer
+from cocotbext.wishbone.driver import WBOp
+from Profiler import profiled
+from Watchdog import progress
+
+
+class WishboneTrafficGenerator:
+    """Wishbone traffic generator
+
+    Drives bursts of operations per bus cycle through a WishboneMaster.
+    Addresses follow one of the patterns sequential, strided, hotset or
+    random, the read/write mix & the ratio of idle bus cycles are configurable.
+    Results of each bus cycle are passed to the optional checker.
+    """
+
+    patterns = ("sequential", "strided", "hotset", "random")
+
+    def __init__(self, master, adr_width, dat_width, pattern="random", burst=8,
+                 read_ratio=0.5, idle_ratio=0.0, stride=1, hot_set=8, hot_ratio=0.9,
+                 callback=None, checker=None, *args, **kwargs):
+        self._version = "0.0.1"
+
+        if master.clock is None:
+            # Transaction level model without bus signals
+            self.log = master.log
+        else:
+            self.log = logging.getLogger(f"cocotb.{master.bus.cyc._path}")
+
+        self.log.info("Wishbone traffic generator")
+        self.log.info("  cocotbext-wishbone-traffic version %s", self._version)
+        self.log.info("  Copyright (c) 2022 Torsten Meissner")
+
+        if pattern not in self.patterns:
+            raise ValueError(f"Unknown address pattern {pattern}, valid are {self.patterns}")
+        if not 0.0 <= idle_ratio < 1.0:
+            raise ValueError(f"Idle ratio {idle_ratio} not in [0.0, 1.0)")
+
+        self._master = master
+        self._adr_size = 2**adr_width
+        self._dat_width = dat_width
+        self._pattern = pattern
+        self._burst = burst
+        self._read_ratio = read_ratio
+        self._idle_ratio = idle_ratio
+        self._stride = stride
+        self._hot_ratio = hot_ratio
+        self._hot_set = random.sample(range(self._adr_size), min(hot_set, self._adr_size))
+        self._callback = callback
+        self._checker = checker
+        self._adr = 0
+
+        self.reads = 0
+        self.writes = 0
+        self.cycles = 0
+
+    def _next_adr(self):
+        if self._pattern == "sequential":
+            self._adr = (self._adr + 1) % self._adr_size
+        elif self._pattern == "strided":
+            self._adr = (self._adr + self._stride) % self._adr_size
+        elif self._pattern == "hotset" and random.random() < self._hot_ratio:
+            self._adr = random.choice(self._hot_set)
+        else:
+            self._adr = random.randrange(self._adr_size)
+        return self._adr
+
+    def _ops(self, count):
+        _ops = []
+        for _ in range(count):
+            if random.random() < self._read_ratio:
+                _ops.append(WBOp(adr=self._next_adr()))
+                self.reads += 1
+            else:
+                _ops.append(WBOp(adr=self._next_adr(), dat=random.getrandbits(self._dat_width)))
+                self.writes += 1
+        return _ops
+
+    @profiled
+    async def run(self, transactions=None, sim_time_ns=None):
+        """Run for a number of transactions and/or a sim time budget
+
+        Returns the number of transactions done.
+        """
+        if transactions is None and sim_time_ns is None:
+            raise ValueError("Give number of transactions or sim time budget")
+        _start = get_sim_time('ns')
+        _done = 0
+        while True:
+            if transactions is not None and _done >= transactions:
+                break
+            if sim_time_ns is not None and get_sim_time('ns') - _start >= sim_time_ns:
+                break
+            _count = self._burst
+            if transactions is not None:
+                _count = min(_count, transactions - _done)
+            _ops = self._ops(_count)
+            if self._checker:
+                self._checker.expect(_ops)
+            _res = await self._master.send_cycle(_ops)
+            _busy = self._master._clk_cycle_count
+            if self._checker:
+                self._checker.check(_ops, _res)
+            if self._callback:
+                self._callback(_res)
+            _done += _count
+            self.cycles += 1
+            progress(_count)
+            # Keep the bus idle in relation to the cycles it was busy
+            if self._idle_ratio:
+                _idle = round(_busy * self._idle_ratio / (1 - self._idle_ratio))
+                if _idle and self._master.clock is None:
+                    # Transaction level model without clock signal
+                    await Timer(_idle * self._master.period_ns, units="ns")
+                elif _idle:
+                    await ClockCycles(self._master.clock, _idle)
+        self.log.info(f"{self._pattern}: {_done} transactions ({self.writes} writes, "
+                      f"{self.reads} reads) in {self.cycles} bus cycles, "
+                      f"{get_sim_time('ns') - _start} ns")
+        return _done
+
+
+class WishboneShadowChecker:
+    """Wishbone/SRAM streaming checker
+
+    Mirrors the issued Wishbone operations in a shadow memory and checks
+    the SRAM accesses (from a SramMonitor callback) and the Wishbone
+    read results against it as they happen. Memory use is bounded by the
+    touched address space, not by the number of transactions.
+
+    An SRAM access not matching the next expected operation resyncs the
+    checker on the first pending operation of the same type & address,
+    the skipped operations are reported as missed.
+    """
+
+    def __init__(self, name="wishbone", sram=True, *args, **kwargs):
+        self.log = logging.getLogger(f"cocotb.{name}.checker")
+        self._shadow = {}
+        # Operations issued on the bus but not yet seen on the SRAM side
+        self._pending = deque()
+        # Data of SRAM reads not yet returned on the bus
+        self._reads = deque()
+        self._sram = sram
+        self.checked = 0
+        self.errors = 0
+
+    def state(self):
+        return (f"{len(self._pending)} operations pending on SRAM side, "
+                f"{len(self._reads)} reads pending on bus side, {self.checked} checked")
+
+    def _error(self, msg):
+        self.errors += 1
+        self.log.error(msg)
+
+    def expect(self, ops):
+        """Register operations of a bus cycle before it is sent"""
+        if self._sram:
+            self._pending.extend(ops)
+
+    def sram(self, tr):
+        """Check one SRAM access, use as SramMonitor callback"""
+        _adr = int(tr["adr"])
+        _data = int(tr["data"])
+        _type = tr["type"]
+        for _index, _op in enumerate(self._pending):
+            if _op.adr == _adr and (_op.dat is None) == (_type == "read"):
+                break
+        else:
+            self._error(f"Unexpected SRAM {_type} at adr {hex(_adr)}")
+            return
+        for _ in range(_index):
+            _op = self._pending.popleft()
+            if _op.dat is None:
+                self._error(f"Missed SRAM read at adr {hex(_op.adr)}")
+                # Keeps the bus reads aligned, the result isn't checked
+                self._reads.append(None)
+            else:
+                self._error(f"Missed SRAM write at adr {hex(_op.adr)}")
+        _op = self._pending.popleft()
+        if _type == "write":
+            if _data != _op.dat:
+                self._error(f"SRAM write of {hex(_data)} to adr {hex(_adr)}, "
+                            f"expected {hex(_op.dat)}")
+            self._shadow[_adr] = _op.dat
+        else:
+            if self._shadow.setdefault(_adr, _data) != _data:
+                self._error(f"SRAM read of {hex(_data)} from adr {hex(_adr)}, "
+                            f"expected {hex(self._shadow[_adr])}")
+            self._reads.append(_data)
+        self.checked += 1
+
+    def check(self, ops, results):
+        """Check results of a bus cycle against the shadow memory"""
+        for _op, _res in zip(ops, results):
+            if _op.dat is not None:
+                if not self._sram:
+                    self._shadow[_op.adr] = _op.dat
+                continue
+            _data = int(_res.datrd)
+            if self._sram:
+                if not self._reads:
+                    self._error(f"Bus read from adr {hex(_op.adr)} without SRAM read")
+                    continue
+                _expected = self._reads.popleft()
+                if _expected is None:
+                    # SRAM read was missed, reported already
+                    continue
+            else:
+                _expected = self._shadow.setdefault(_op.adr, _data)
+            if _data != _expected:
+                self._error(f"Bus read of {hex(_data)} from adr {hex(_op.adr)}, "
+                            f"expected {hex(_expected)}")
+            self.checked += 1
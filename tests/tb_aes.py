@@ -1,11 +1,27 @@
+from Startup import startup, lazy_import
 import logging
+import os
 import cocotb
-from Vai import VaiDriver, VaiReceiver, VaiMonitor
-from cocotb.clock import Clock
+from Vai import VaiBus, VaiDriver, VaiReceiver, VaiMonitor, VaiPerfMonitor
+from Profiler import profiler
+from Benchmark import Benchmark, transactions
+from Fixture import Fixture
+from Seeds import run_seeds
+from Watchdog import Watchdog
+import Tlm
+from HdlClock import start_clock
 from cocotb.queue import Queue
 from cocotb.triggers import RisingEdge, Timer
-from Crypto.Cipher import AES
-import vsc
+
+# Heavy dependencies are loaded on first use
+AES = lazy_import("Crypto.Cipher.AES")
+AesCoverage = lazy_import("AesCoverage")
+vsc = lazy_import("vsc")
+
+# Functional coverage, disable with COVERAGE=0
+COVERAGE = os.environ.get("COVERAGE") != "0"
+
+startup.mark("tb_aes imported")
 
 
 # Reset coroutine
@@ -15,167 +31,164 @@ async def reset_dut(reset_n, duration_ns):
     reset_n.value = 1
 
 
-# Stimuli model class
-@vsc.randobj
-class constraints():
-    def __init__(self):
-        self.key = vsc.rand_bit_t(128)
-        self.data = vsc.rand_bit_t(128)
-
-    @vsc.constraint
-    def c(self):
-        self.data >= 0 and self.data <= 2**128-1
-        vsc.dist(self.key, [
-            vsc.weight(0,  15),
-            vsc.weight((1,2**128-2), 70),
-            vsc.weight((2**128-1), 15)])
-
-
-# Stimuli covergroup
-@vsc.covergroup
-class covergroup():
-    def __init__(self):
-        self.with_sample(
-            mode = vsc.bit_t(1),
-            key = vsc.bit_t(128)
-        )
-
-        self.enc = vsc.coverpoint(self.mode, bins=dict(
-            enc = vsc.bin(0)))
-
-        self.dec = vsc.coverpoint(self.mode, bins=dict(
-            dec = vsc.bin(1)))
-
-        self.key0 = vsc.coverpoint(self.key, bins=dict(
-            key0 = vsc.bin(0)))
-
-        self.keyF = vsc.coverpoint(self.key, bins=dict(
-            keyF = vsc.bin(2**128-1)))
-
-        self.encXkey0 = vsc.cross([self.enc, self.key0])
-        self.encXkeyF = vsc.cross([self.enc, self.keyF])
-
-        self.decXkey0 = vsc.cross([self.dec, self.key0])
-        self.decXkeyF = vsc.cross([self.dec, self.keyF])
-
-
-async def cg_sample(cg, queue):
+async def cg_sample(env):
     while True:
-        _data = await queue.get()
-        cg.sample(_data[0].value, _data[1].value)
-
-
-@cocotb.test(skip=False)
+        _data = await env.vai_in_queue.get()
+        env.cg.sample(_data[0], _data[1])
+
+
+class AesFixture(Fixture):
+    """AES testbench environment, built once & shared by the tests"""
+
+    ports = ("clk_i", "reset_i", "valid_i", "accept_o", "data_o", "valid_o", "accept_i")
+
+    def __init__(self, dut):
+        self.dut = dut
+        self.resolve(dut)
+        self.clkedge = RisingEdge(self.clk_i)
+
+        self.input_bus = VaiBus(dut, [("mode_i", 1), ("key_i", 128), ("data_i", 128)])
+        # DUT input side
+        self.vai_driver = VaiDriver(self.clk_i, self.input_bus, self.valid_i, self.accept_o)
+        self.vai_in_queue = cocotb.queue.Queue()
+        self.vai_in_monitor = VaiMonitor(self.clk_i, self.input_bus, self.valid_i,
+            self.accept_o, self.vai_in_queue)
+        # DUT output side
+        self.vai_receiver = VaiReceiver(self.clk_i, self.data_o, self.valid_o, self.accept_i,
+            "bytes")
+        self.vai_out_monitor = VaiMonitor(self.clk_i, self.data_o, self.valid_o, self.accept_i)
+        # DUT latency & throughput
+        self.vai_perf_monitor = VaiPerfMonitor(self.clk_i, self.valid_i, self.accept_o,
+            self.valid_o, self.accept_i)
+        self._monitors = [self.vai_in_monitor, self.vai_out_monitor, self.vai_perf_monitor]
+        # Ends a test if no transactions complete anymore
+        self.watchdog = Watchdog(vai_driver=self.vai_driver, vai_receiver=self.vai_receiver,
+            vai_in_queue=self.vai_in_queue)
+
+        self.cr = AesCoverage.constraints()
+        self.cg = AesCoverage.covergroup() if COVERAGE else None
+
+        self._tasks = []
+
+    def _drain(self):
+        # Drop input beats a former test left unsampled
+        while not self.vai_in_queue.empty():
+            self.vai_in_queue.get_nowait()
+
+    async def start(self):
+        self._drain()
+        for monitor in self._monitors:
+            monitor._restart()
+
+        # Drive input defaults (setimmediatevalue to avoid x asserts)
+        self.input_bus.setimmediatevalue(0)
+        self.valid_i.setimmediatevalue(0)
+        self.accept_i.setimmediatevalue(0)
+
+        self._tasks = []
+        self.watchdog.start()
+        # Start the clock of CLK_PERIOD_NS, unless generated in HDL
+        _clock = start_clock(self.clk_i)
+        if _clock:
+            self._tasks.append(_clock)
+        if COVERAGE:
+            self._tasks.append(cocotb.start_soon(cg_sample(self)))
+
+        # Execution will block until reset_dut has completed
+        self.dut._log.info("Hold reset")
+        await reset_dut(self.reset_i, 100)
+        self.dut._log.info("Released reset")
+
+    async def reset(self):
+        """Reset DUT & coverage between the iterations of a test"""
+        self._drain()
+        if COVERAGE:
+            # Fresh instance, the type coverage is merged over the seeds
+            self.cg = AesCoverage.covergroup()
+        await reset_dut(self.reset_i, 100)
+
+    def stop(self):
+        self.watchdog.stop()
+        for monitor in self._monitors:
+            monitor.stop()
+        for task in self._tasks:
+            task.kill()
+        self._tasks = []
+
+
+@cocotb.test(skip=Tlm.ENABLED)
 async def test_aes_enc(dut):
     """ Test AES encryption """
 
-    clkedge = RisingEdge(dut.clk_i)
-
-    # Connect reset
-    reset = dut.reset_i
-
-    _input = [dut.mode_i, dut.key_i, dut.data_i]
-    _output = dut.data_o
-    # DUT input side
-    vai_driver = VaiDriver(dut.clk_i, _input, dut.valid_i, dut.accept_o)
-    vai_in_queue = cocotb.queue.Queue()
-    vai_in_monitor = VaiMonitor(dut.clk_i, _input, dut.valid_i, dut.accept_o, vai_in_queue)
-    # DUT output side
-    vai_receiver = VaiReceiver(dut.clk_i, dut.data_o, dut.valid_o, dut.accept_i)
-    vai_out_monitor = VaiMonitor(dut.clk_i, _output, dut.valid_o, dut.accept_i)
-
-    cr = constraints()
-    cg = covergroup()
-    cocotb.start_soon(cg_sample(cg, vai_in_queue))
-
-    # Drive input defaults (setimmediatevalue to avoid x asserts)
-    dut.mode_i.setimmediatevalue(0)
-    dut.key_i.setimmediatevalue(0)
-    dut.data_i.setimmediatevalue(0)
-    dut.valid_i.setimmediatevalue(0)
-    dut.accept_i.setimmediatevalue(0)
-
-    clock = Clock(dut.clk_i, 10, units="ns")  # Create a 10 ns period clock
-    cocotb.start_soon(clock.start())  # Start the clock
-
-    # Execution will block until reset_dut has completed
-    dut._log.info("Hold reset")
-    await reset_dut(reset, 100)
-    dut._log.info("Released reset")
-
-    # Test 10 AES calculations
-    for i in range(20):
-        # Get now random stimuli
-        cr.randomize()
-        _key = cr.key
-        _data = cr.data
-        await clkedge
-        # Drive AES inputs
-        await vai_driver.send([0, _key, _data])
-        # Calc reference data
-        _aes = AES.new(_key.to_bytes(16, 'big'), AES.MODE_ECB)
-        _ref = _aes.encrypt(_data.to_bytes(16, 'big'))
-        # Get DUT output data
-        _rec = await vai_receiver.receive()
-        # Equivalence check
-        assert _rec.buff == _ref, \
-            f"Encrypt error, got 0x{_rec.buff.hex()}, expected 0x{_ref.hex()}"
-
-
-@cocotb.test(skip=False)
+    env = await AesFixture.setup(dut)
+
+    async def iteration(seed):
+        # Test AES calculations, 20 by default
+        _count = transactions(20)
+        for _ in range(_count):
+            # Get now random stimuli
+            env.cr.randomize()
+            _key = env.cr.key
+            _data = env.cr.data
+            await env.clkedge
+            # Drive AES inputs
+            await env.vai_driver.send([0, _key, _data])
+            # Calc reference data
+            _aes = AES.new(_key.to_bytes(16, 'big'), AES.MODE_ECB)
+            _ref = _aes.encrypt(_data.to_bytes(16, 'big'))
+            # Get DUT output data
+            _rec = await env.vai_receiver.receive()
+            # Equivalence check
+            assert _rec == _ref, \
+                f"Encrypt error, got 0x{_rec.hex()}, expected 0x{_ref.hex()}"
+        return _count
+
+    # One iteration per seed, SEEDS=K runs K in this simulation
+    with Benchmark("tb_aes_enc") as bench:
+        bench.stop(await run_seeds("tb_aes_enc", iteration, env.reset, (env.cr,)))
+    profiler.write_report("tb_aes_enc")
+
+    with open('results/tb_aes_enc_perf.txt', 'w', encoding='utf-8') as f:
+        f.write(env.vai_perf_monitor.report())
+
+
+@cocotb.test(skip=Tlm.ENABLED)
 async def test_aes_dec(dut):
     """ Test AES decryption """
 
-    clkedge = RisingEdge(dut.clk_i)
-
-    # Connect reset
-    reset = dut.reset_i
-
-    _input = [dut.mode_i, dut.key_i, dut.data_i]
-    _output = dut.data_o
-    # DUT input side
-    vai_driver = VaiDriver(dut.clk_i, _input, dut.valid_i, dut.accept_o)
-    vai_in_queue = cocotb.queue.Queue()
-    vai_in_monitor = VaiMonitor(dut.clk_i, _input, dut.valid_i, dut.accept_o, vai_in_queue)
-    # DUT output side
-    vai_receiver = VaiReceiver(dut.clk_i, dut.data_o, dut.valid_o, dut.accept_i)
-    vai_out_monitor = VaiMonitor(dut.clk_i, _output, dut.valid_o, dut.accept_i)
-
-    cr = constraints()
-    cg = covergroup()
-    cocotb.start_soon(cg_sample(cg, vai_in_queue))
-
-    # Drive input defaults (setimmediatevalue to avoid x asserts)
-    dut.mode_i.setimmediatevalue(0)
-    dut.key_i.setimmediatevalue(0)
-    dut.data_i.setimmediatevalue(0)
-    dut.valid_i.setimmediatevalue(0)
-    dut.accept_i.setimmediatevalue(0)
-
-    clock = Clock(dut.clk_i, 10, units="ns")  # Create a 10 ns period clock
-    cocotb.start_soon(clock.start())  # Start the clock
-
-    # Execution will block until reset_dut has completed
-    await reset_dut(reset, 100)
-    dut._log.info("Released reset")
-
-    # Test 10 AES calculations
-    for i in range(20):
-        # Get now random stimuli
-        cr.randomize()
-        _key = cr.key
-        _data = cr.data
-        await clkedge
-        # Drive AES inputs
-        await vai_driver.send([1, _key, _data])
-        # Calc reference data
-        _aes = AES.new(_key.to_bytes(16, 'big'), AES.MODE_ECB)
-        _ref = _aes.decrypt(_data.to_bytes(16, 'big'))
-        # Get DUT output data
-        _rec = await vai_receiver.receive()
-        # Equivalence check
-        assert _rec.buff == _ref, \
-            f"Decrypt error, got 0x{_rec.buff.hex()}, expected 0x{_ref.hex()}"
-
-    with open('results/tb_aes_fcover.txt', 'w', encoding='utf-8') as f:
-        f.write(vsc.get_coverage_report())
+    env = await AesFixture.setup(dut)
+
+    async def iteration(seed):
+        # Test AES calculations, 20 by default
+        _count = transactions(20)
+        for _ in range(_count):
+            # Get now random stimuli
+            env.cr.randomize()
+            _key = env.cr.key
+            _data = env.cr.data
+            await env.clkedge
+            # Drive AES inputs
+            await env.vai_driver.send([1, _key, _data])
+            # Calc reference data
+            _aes = AES.new(_key.to_bytes(16, 'big'), AES.MODE_ECB)
+            _ref = _aes.decrypt(_data.to_bytes(16, 'big'))
+            # Get DUT output data
+            _rec = await env.vai_receiver.receive()
+            # Equivalence check
+            assert _rec == _ref, \
+                f"Decrypt error, got 0x{_rec.hex()}, expected 0x{_ref.hex()}"
+        return _count
+
+    # One iteration per seed, SEEDS=K runs K in this simulation
+    with Benchmark("tb_aes_dec") as bench:
+        bench.stop(await run_seeds("tb_aes_dec", iteration, env.reset, (env.cr,)))
+    profiler.write_report("tb_aes_dec")
+
+    with open('results/tb_aes_dec_perf.txt', 'w', encoding='utf-8') as f:
+        f.write(env.vai_perf_monitor.report())
+
+    if COVERAGE:
+        with open('results/tb_aes_fcover.txt', 'w', encoding='utf-8') as f:
+            f.write(vsc.get_coverage_report())
+
+    startup.write_report("tb_aes")
@@ -1,10 +1,19 @@
+from Startup import startup
 import logging
 import random
 import cocotb
 from Uart import UartDriver
 from Vai import VaiReceiver
-from cocotb.clock import Clock
-from cocotb.triggers import RisingEdge, Timer
+from Tlm import UartTlm, UartTlmReceiver
+import Tlm
+from Profiler import profiler
+from Benchmark import Benchmark, transactions
+from Seeds import run_seeds
+from Watchdog import Watchdog
+from HdlClock import start_clock
+from cocotb.triggers import Timer
+
+startup.mark("tb_uartrx imported")
 
 
 # Reset coroutine
@@ -14,11 +23,8 @@ async def reset_dut(reset_n, duration_ns):
     reset_n.value = 1
 
 
-@cocotb.test()
-async def test_uartrx(dut):
-    """ First simple test """
-
-    clkedge = RisingEdge(dut.clk_i)
+async def setup_dut(dut):
+    """Start clock, reset DUT, return UART driver & VAI receiver"""
 
     # Connect reset
     reset_n = dut.reset_n_i
@@ -32,17 +38,46 @@ async def test_uartrx(dut):
     dut.rx_i.setimmediatevalue(1)
     dut.accept_i.setimmediatevalue(0)
 
-    clock = Clock(dut.clk_i, 10, units="ns")  # Create a 10 ns period clock
-    cocotb.start_soon(clock.start())  # Start the clock
+    start_clock(dut.clk_i)  # Start the clock, 10 ns period by default
 
     # Execution will block until reset_dut has completed
     await reset_dut(reset_n, 100)
     dut._log.info("Released reset")
 
-    # Test 10 UART transmissions
-    for i in range(10):
-        await Timer(100, units="ns")
-        val = random.randint(0, 255)
-        await uart_driver.send(val)
-        rec = await vai_receiver.receive();
-        assert rec == val, "UART received data was incorrect on the {}th cycle".format(i)
+    return uart_driver, vai_receiver
+
+
+@cocotb.test()
+async def test_uartrx(dut):
+    """ First simple test """
+
+    if Tlm.ENABLED:
+        # UART driver, DUT & VAI receiver on transaction level
+        uart_driver = UartTlm(10, 8, True)
+        vai_receiver = UartTlmReceiver(uart_driver)
+    else:
+        uart_driver, vai_receiver = await setup_dut(dut)
+
+    # End the test if no transactions complete anymore
+    Watchdog(uart_driver=uart_driver, vai_receiver=vai_receiver).start()
+
+    async def iteration(seed):
+        # Test UART transmissions, 10 by default
+        _count = transactions(10)
+        for i in range(_count):
+            await Timer(100, units="ns")
+            val = random.randint(0, 255)
+            await uart_driver.send(val)
+            rec = await vai_receiver.receive();
+            assert rec == val, "UART received data was incorrect on the {}th cycle".format(i)
+        return _count
+
+    async def reset():
+        if not Tlm.ENABLED:
+            await reset_dut(dut.reset_n_i, 100)
+
+    # One iteration per seed, SEEDS=K runs K in this simulation
+    with Benchmark("tb_uartrx") as bench:
+        bench.stop(await run_seeds("tb_uartrx", iteration, reset))
+    profiler.write_report("tb_uartrx")
+    startup.write_report("tb_uartrx")
@@ -1,14 +1,25 @@
+from Startup import startup, lazy_import
 import logging
 import random
 import cocotb
-import wavedrom
 from collections import defaultdict
 from Sram import SramRead, SramWrite, SramMonitor
-from cocotb.clock import Clock
+from Profiler import profiler
+from Benchmark import Benchmark, transactions
+from Wishbone import WishboneTrafficGenerator, WishboneShadowChecker
+from Tlm import WishboneTlm
+import Tlm
+from HdlClock import start_clock
+from Watchdog import Watchdog
 from cocotb.triggers import RisingEdge, Timer
 from cocotbext.wishbone.driver import WishboneMaster, WBOp
 from cocotb.wavedrom import Wavedrom, trace
 
+# Only needed to render SVG
+wavedrom = lazy_import("wavedrom")
+
+startup.mark("tb_wishbone imported")
+
 
 # Reset coroutine
 async def reset_dut(reset_n, duration_ns):
@@ -16,33 +27,31 @@ async def reset_dut(reset_n, duration_ns):
     await Timer(duration_ns, units="ns")
     reset_n.value = 0
 
+# Widths set by generics in Makefile
+ADR_WIDTH = 8
+DAT_WIDTH = 16
+
+
 def wave2svg(wave, file):
     svg = wavedrom.render(wave)
     svg.saveas(file)
 
 
-@cocotb.test()
-async def test_wishbone(dut):
-    """ First simple test """
-
-    clkedge = RisingEdge(dut.wbclk_i)
+async def setup_dut(dut, memory, callback=None, record=True):
+    """Start SRAM models & clock, reset DUT, return Wishbone master & SRAM monitor"""
 
     # Connect reset
     reset = dut.wbrst_i
 
-
-    # Create empty SRAM memory
-    memory = defaultdict()
-
     mem_read = SramRead(dut.wbclk_i, dut.localren_o,
         dut.localadress_o, dut.localdata_i, memory);
     mem_write = SramWrite(dut.wbclk_i, dut.localwen_o,
         dut.localadress_o, dut.localdata_o, memory);
     sram_monitor = SramMonitor(dut.wbclk_i, dut.localwen_o, dut.localren_o,
-        dut.localadress_o, dut.localdata_i, dut.localdata_o);
+        dut.localadress_o, dut.localdata_i, dut.localdata_o, callback, record);
 
     wbmaster = WishboneMaster(dut, "", dut.wbclk_i,
-        width=16,   # size of data bus
+        width=DAT_WIDTH,   # size of data bus
         timeout=10, # in clock cycle number
         signals_dict={"cyc":  "wbcyc_i",
                       "stb":  "wbstb_i",
@@ -59,26 +68,42 @@ async def test_wishbone(dut):
     dut.wbadr_i.setimmediatevalue(0)
     dut.wbdat_i.setimmediatevalue(0)
 
-    clock = Clock(dut.wbclk_i, 10, units="ns")  # Create a 10 ns period clock
-    cocotb.start_soon(clock.start())  # Start the clock
+    start_clock(dut.wbclk_i)  # Start the clock, 10 ns period by default
 
     # Execution will block until reset_dut has completed
     await reset_dut(reset, 100)
     dut._log.info("Released reset")
 
+    return wbmaster, sram_monitor
+
+
+@cocotb.test(skip=Tlm.ENABLED)
+async def test_wishbone(dut):
+    """ First simple test """
+
+    clkedge = RisingEdge(dut.wbclk_i)
+
+    # Create empty SRAM memory
+    memory = defaultdict()
+
+    wbmaster, sram_monitor = await setup_dut(dut, memory)
+
     # Trace transmissions using wavedrom
     with trace(dut.wbcyc_i, dut.wbstb_i, dut.wbwe_i, dut.wback_o,
         dut.wbadr_i, dut.wbdat_i, dut.wbdat_o, clk=dut.wbclk_i) as waves:
 
-        # Test 10 Wishbone transmissions
-        for i in range(10):
-            await clkedge
-            adr = random.randint(0, 255)
-            data = random.randint(0, 2**16-1)
-            await wbmaster.send_cycle([WBOp(adr=adr, dat=data)])
-            rec = await wbmaster.send_cycle([WBOp(adr=adr)])
-            assert rec[0].datrd == data, \
-                f"Read data incorrect, got {hex(rec[0].datrd)}, expected {hex(data)}"
+        # Test Wishbone transmissions, 10 by default
+        _count = transactions(10)
+        with Benchmark("tb_wishbone") as bench:
+            for _ in range(_count):
+                await clkedge
+                adr = random.randint(0, 2**ADR_WIDTH-1)
+                data = random.randint(0, 2**DAT_WIDTH-1)
+                await wbmaster.send_cycle([WBOp(adr=adr, dat=data)])
+                rec = await wbmaster.send_cycle([WBOp(adr=adr)])
+                assert rec[0].datrd == data, \
+                    f"Read data incorrect, got {hex(rec[0].datrd)}, expected {hex(data)}"
+            bench.stop(_count)
 
         # Print out waveforms as json & svg
         _wave = waves.dumpj()
@@ -92,3 +117,37 @@ async def test_wishbone(dut):
         f.write((f"{'Time':7}{'Type':7}{'Adr':6}{'Data'}\n"))
         for key, value in sram_monitor.transactions.items():
             f.write((f"{key:7}{value['type']:7}{hex(value['adr']):6}{hex(value['data'])}\n"))
+
+    profiler.write_report("tb_wishbone")
+
+
+@cocotb.test()
+async def test_wishbone_traffic(dut):
+    """ Multi-operation bus cycles with all address patterns """
+
+    if Tlm.ENABLED:
+        # DUT & SRAM on transaction level, check bus side only
+        checker = WishboneShadowChecker(dut._name, sram=False)
+        wbmaster = WishboneTlm(ADR_WIDTH, DAT_WIDTH)
+    else:
+        # Unwritten SRAM reads as zero
+        memory = defaultdict(int)
+        # Check bus & SRAM side against shadow memory, no SRAM transaction log
+        checker = WishboneShadowChecker(dut._name)
+        wbmaster, sram_monitor = await setup_dut(dut, memory, checker.sram, False)
+
+    # End the test if no bus cycles complete anymore
+    Watchdog(checker=checker).start()
+
+    for pattern in WishboneTrafficGenerator.patterns:
+        traffic = WishboneTrafficGenerator(wbmaster, ADR_WIDTH, DAT_WIDTH,
+            pattern=pattern, burst=8, read_ratio=0.5, idle_ratio=0.1, stride=3,
+            checker=checker)
+        with Benchmark(f"tb_wishbone_traffic_{pattern}") as bench:
+            bench.stop(await traffic.run(transactions=transactions(400)))
+
+    assert checker.errors == 0, \
+        f"{checker.errors} of {checker.checked} checked accesses were incorrect"
+
+    profiler.write_report("tb_wishbone_traffic")
+    startup.write_report("tb_wishbone")
@@ -0,0 +1,9 @@
+-- Empty top level for runs with transaction level models (TLM=1)
+-- The cocotb scheduler needs a simulator, the models access no signals
+
+entity tlm is
+end entity tlm;
+
+architecture sim of tlm is
+begin
+end architecture sim;